@@ -0,0 +1,306 @@
+#!/usr/bin/env python
+
+import os
+import sys
+import time
+import array
+import threading
+import contextlib
+import config
+from cache import cache_key
+
+try:
+    import fcntl
+except ImportError:
+    # Without flock (Windows) writers are only serialized within one process
+    fcntl = None
+
+
+_archive = None
+_lock = threading.Lock()
+
+# One fixed-width little-endian file per column: (file name, array typecode, numpy dtype)
+COLUMNS = {
+    'host': ('host.u32', 'I', '<u4'),
+    'test': ('test.u16', 'H', '<u2'),
+    'passed': ('pass.i8', 'b', 'i1'),
+    'score': ('score.i16', 'h', '<i2'),
+    'time': ('time.u32', 'I', '<u4'),
+}
+
+# pass column values; None (informational) tests are stored as -1
+PASSED, FAILED, INFO = 1, 0, -1
+
+
+def require_numpy():
+    try:
+        import numpy
+    except ImportError:
+        raise RuntimeError("The stats command needs NumPy; install it with 'pip install numpy'") from None
+    return numpy
+
+
+def read_names(path):
+    if not os.path.exists(path):
+        return []
+    with open(path, 'r') as handle:
+        # A name cut short by a crash was never referenced by a row
+        return [line[:-1] for line in handle if line.endswith('\n')]
+
+
+def row_count(path):
+    """Rows every column holds in full; a crash between column writes leaves the rest unreadable"""
+    sizes = []
+    for name, code, _ in COLUMNS.values():
+        column = os.path.join(path, name)
+        size = os.path.getsize(column) if os.path.exists(column) else 0
+        sizes.append(size // array.array(code).itemsize)
+    return min(sizes)
+
+
+class ResultArchive:
+    """Append-only columnar store of test outcomes: one row per host, test and scan"""
+
+    def __init__(self, path=None):
+        self.path = os.path.expanduser(path or config.ARCHIVE_PATH)
+        self.lock = threading.Lock()
+        os.makedirs(self.path, exist_ok=True)
+        self.lock_file = open(os.path.join(self.path, 'lock'), 'a')
+        self.names = {kind: open(os.path.join(self.path, kind), 'ab') for kind in ('hosts', 'tests')}
+        self.files = {column: open(os.path.join(self.path, name), 'ab') for column, (name, _, _) in COLUMNS.items()}
+        # Recently used (kind, name) -> id; ids never change, so this only has to stay small
+        self.ids = {}
+
+        import sqlite3
+        # name -> id lookups for the name files, so memory does not grow with the fleet
+        self.conn = sqlite3.connect(os.path.join(self.path, 'names.sqlite3'), check_same_thread=False, isolation_level=None)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.execute('CREATE TABLE IF NOT EXISTS names (kind TEXT, name TEXT, id INTEGER, PRIMARY KEY (kind, name)) WITHOUT ROWID')
+        # How much of each name file the table covers: its byte length and line count
+        self.conn.execute('CREATE TABLE IF NOT EXISTS indexed (kind TEXT PRIMARY KEY, bytes INTEGER, count INTEGER)')
+        with self.locked():
+            self.repair()
+
+    @contextlib.contextmanager
+    def locked(self):
+        """Hold this archive exclusively against other threads and other processes"""
+        with self.lock:
+            if fcntl is not None:
+                fcntl.flock(self.lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(self.lock_file, fcntl.LOCK_UN)
+
+    def repair(self):
+        """Drop a torn append left by a writer that crashed; only safe under locked()"""
+        rows = row_count(self.path)
+        for column, (_, code, _) in COLUMNS.items():
+            size = rows * array.array(code).itemsize
+            if os.fstat(self.files[column].fileno()).st_size != size:
+                self.files[column].truncate(size)
+
+    def indexed(self, kind):
+        row = self.conn.execute('SELECT bytes, count FROM indexed WHERE kind = ?', (kind,)).fetchone()
+        return row or (0, 0)
+
+    def refresh(self, kind):
+        """Index names appended to a name file but not yet in the table; only safe under locked()"""
+        done, count = self.indexed(kind)
+        if os.fstat(self.names[kind].fileno()).st_size == done:
+            return
+        with open(os.path.join(self.path, kind), 'rb') as handle:
+            handle.seek(done)
+            for line in handle:
+                if not line.endswith(b'\n'):
+                    # A name cut short by a crash was never referenced by a row
+                    self.names[kind].truncate(done)
+                    break
+                self.conn.execute('INSERT OR REPLACE INTO names VALUES (?, ?, ?)', (kind, line[:-1].decode(), count))
+                done += len(line)
+                count += 1
+        self.conn.execute('INSERT OR REPLACE INTO indexed VALUES (?, ?, ?)', (kind, done, count))
+
+    def intern(self, kind, name):
+        """Return the id of a host or test name, appending it to its name file if it is new"""
+        index = self.ids.get((kind, name))
+        if index is not None:
+            return index
+        row = self.conn.execute('SELECT id FROM names WHERE kind = ? AND name = ?', (kind, name)).fetchone()
+        if row is not None:
+            index = row[0]
+        else:
+            done, index = self.indexed(kind)
+            line = (name + '\n').encode()
+            # Flushed before any row refers to it
+            self.names[kind].write(line)
+            self.names[kind].flush()
+            self.conn.execute('INSERT INTO names VALUES (?, ?, ?)', (kind, name, index))
+            self.conn.execute('INSERT OR REPLACE INTO indexed VALUES (?, ?, ?)', (kind, done + len(line), index + 1))
+        if len(self.ids) >= config.ARCHIVE_NAME_CACHE:
+            self.ids.clear()
+        self.ids[kind, name] = index
+        return index
+
+    def record(self, host, payload, scanned_at=None):
+        """Append one row per test of a getScanResults payload"""
+        stamp = int(scanned_at or time.time())
+        with self.locked():
+            self.repair()
+            # One transaction per scan; a crash before COMMIT is picked up again by refresh()
+            self.conn.execute('BEGIN')
+            try:
+                for kind in ('hosts', 'tests'):
+                    self.refresh(kind)
+                host_id = self.intern('hosts', cache_key(host))
+                tests = [(self.intern('tests', key), test) for key, test in sorted(payload.items())]
+            except BaseException:
+                self.conn.execute('ROLLBACK')
+                # Cached ids may have come from the rolled-back rows
+                self.ids.clear()
+                raise
+            self.conn.execute('COMMIT')
+            columns = {
+                'host': array.array('I', [host_id] * len(tests)),
+                'test': array.array('H', [test_id for test_id, _ in tests]),
+                'passed': array.array('b', [INFO if test['pass'] is None else int(bool(test['pass'])) for _, test in tests]),
+                'score': array.array('h', [max(-32768, min(32767, test['score_modifier'] or 0)) for _, test in tests]),
+                'time': array.array('I', [stamp] * len(tests)),
+            }
+            for column, values in columns.items():
+                if sys.byteorder == 'big':
+                    values.byteswap()
+                values.tofile(self.files[column])
+                self.files[column].flush()
+
+    def close(self):
+        with self.lock:
+            for handle in (*self.files.values(), *self.names.values(), self.lock_file):
+                handle.close()
+            self.conn.close()
+
+
+class ArchiveStats:
+    """NumPy views over a ResultArchive's memory-mapped columns"""
+
+    def __init__(self, path=None):
+        np = self.np = require_numpy()
+        self.path = os.path.expanduser(path or config.ARCHIVE_PATH)
+        self.hosts = read_names(os.path.join(self.path, 'hosts'))
+        self.tests = read_names(os.path.join(self.path, 'tests'))
+        self.rows = row_count(self.path) if os.path.isdir(self.path) else 0
+        for column, (name, _, dtype) in COLUMNS.items():
+            if self.rows:
+                # Plain ndarray views over the maps, without memmap's per-operation overhead
+                values = np.asarray(np.memmap(os.path.join(self.path, name), dtype=dtype, mode='r', shape=(self.rows,)))
+            else:
+                values = np.zeros(0, dtype=dtype)
+            setattr(self, column, values)
+        self._keys = None
+        self._latest = None
+        self._scores = None
+
+    def scan_keys(self):
+        """Sorted host << 32 | time keys, one per row; equal keys are rows of one scan"""
+        if self._keys is None:
+            self._keys = self.np.sort((self.host.astype(self.np.int64) << 32) | self.time)
+        return self._keys
+
+    def latest(self):
+        """host, test, passed and score columns cut down to the rows of each host's newest scan"""
+        if self._latest is None:
+            np = self.np
+            keys = self.scan_keys()
+            # The last key of each host's run holds its newest time
+            last = keys[np.flatnonzero(np.diff(keys >> 32, append=-1))]
+            newest = np.zeros(len(self.hosts), dtype=np.int64)
+            newest[last >> 32] = last & 0xFFFFFFFF
+            rows = np.flatnonzero(self.time == newest[self.host])
+            self._latest = {column: getattr(self, column)[rows] for column in ('host', 'test', 'passed', 'score')}
+        return self._latest
+
+    def failure_rates(self):
+        """[(test, failed, scored hosts, rate)] over each host's newest scan, worst first"""
+        np = self.np
+        latest = self.latest()
+        total = np.bincount(latest['test'][latest['passed'] != INFO], minlength=len(self.tests))
+        failed = np.bincount(latest['test'][latest['passed'] == FAILED], minlength=len(self.tests))
+        rates = np.divide(failed, total, out=np.zeros(len(total)), where=total > 0)
+        order = np.argsort(-rates, kind='stable')
+        return [(self.tests[i], int(failed[i]), int(total[i]), float(rates[i])) for i in order if total[i]]
+
+    def scores(self):
+        """(host ids, scores, failed tests) for each host's newest scan; a score is 100 plus every score_modifier"""
+        if self._scores is None:
+            np = self.np
+            latest = self.latest()
+            seen = np.bincount(latest['host'], minlength=len(self.hosts)) > 0
+            totals = 100 + np.bincount(latest['host'], weights=latest['score'], minlength=len(self.hosts)).astype(np.int64)
+            failures = np.bincount(latest['host'][latest['passed'] == FAILED], minlength=len(self.hosts))
+            self._scores = np.flatnonzero(seen), totals[seen], failures[seen]
+        return self._scores
+
+    def score_distribution(self, width=10):
+        """Percentiles and a histogram of host scores in bands of `width` points"""
+        np = self.np
+        _, scores, _ = self.scores()
+        if not len(scores):
+            return {'hosts': 0, 'percentiles': {}, 'bands': []}
+        percentiles = dict(zip(('min', 'p10', 'p50', 'p90', 'max'), np.percentile(scores, [0, 10, 50, 90, 100]).tolist()))
+        low = int(np.floor(scores.min() / width))
+        counts = np.bincount((np.floor(scores / width) - low).astype(np.int64))
+        bands = [((low + band) * width, int(count)) for band, count in enumerate(counts) if count]
+        return {'hosts': len(scores), 'percentiles': percentiles, 'bands': bands}
+
+    def worst(self, count=10):
+        """[(host, score, failed tests)] for the lowest-scoring hosts"""
+        np = self.np
+        hosts, scores, failures = self.scores()
+        count = min(count, len(scores))
+        if not count:
+            return []
+        picked = np.argpartition(scores, count - 1)[:count]
+        picked = picked[np.lexsort((-failures[picked], scores[picked]))]
+        return [(self.hosts[hosts[i]], int(scores[i]), int(failures[i])) for i in picked]
+
+    def trend(self, days=30, bucket=86400):
+        """[(bucket start, scans, failure rate)] over every row recorded in the last `days` days"""
+        np = self.np
+        if not self.rows:
+            return []
+        first = int(time.time() - days * 86400) // bucket
+        mask = (self.time >= first * bucket) & (self.passed != INFO)
+        slots = self.time[mask] // bucket - first
+        total = np.bincount(slots)
+        failed = np.bincount(slots[self.passed[mask] == FAILED], minlength=len(total))
+        # Distinct keys are scans; count those that landed in each bucket
+        keys = self.scan_keys()
+        scans = keys[np.diff(keys, prepend=-1) != 0] & 0xFFFFFFFF
+        scans = np.bincount(scans[scans >= first * bucket] // bucket - first, minlength=len(total))
+        return [(int(first + slot) * bucket, int(scans[slot]), float(failed[slot] / total[slot])) for slot in np.flatnonzero(total)]
+
+    def report(self, top=10, days=30):
+        return {
+            'rows': self.rows,
+            'hosts': len(self.hosts),
+            'tests': len(self.tests),
+            'failure_rates': [
+                {'test': test, 'failed': failed, 'hosts': total, 'rate': round(rate, 4)}
+                for test, failed, total, rate in self.failure_rates()
+            ],
+            'scores': self.score_distribution(),
+            'worst': [{'host': host, 'score': score, 'failed': failed} for host, score, failed in self.worst(top)],
+            'trend': [{'day': day, 'scans': scans, 'failure_rate': round(rate, 4)} for day, scans, rate in self.trend(days)],
+        }
+
+
+def get_archive():
+    """Return the result archive shared by this process"""
+    global _archive
+    if _archive is None:
+        with _lock:
+            if _archive is None:
+                _archive = ResultArchive()
+    return _archive
@@ -0,0 +1,303 @@
+#!/usr/bin/env python
+
+import time
+import asyncio
+import aiohttp
+from utils import Utils
+from polling import PollPolicy
+from cache import get_cache
+from batch import BaseBatchRunner, BatchState
+from ratelimit import get_limiter, parse_retry_after
+from metrics import ScanTimer
+from retry import TRANSIENT_STATUS, CircuitOpenError, backoff_delay, get_breaker
+import config
+
+
+class AsyncScanner:
+    """asyncio counterpart to Scanner that shares one aiohttp session"""
+
+    def __init__(self, options, session, cache=None):
+        self.options = options
+        self.session = session
+        if cache is None and getattr(options, 'use_cache', False):
+            cache = get_cache()
+        self.cache = cache
+        self.base = getattr(options, 'api_base', None) or config.API_BASE_URL
+        self.start = time.time()
+        self.end = None
+        self.scan_id = None
+        self.state = None
+        self.running = True
+        self.cooldown_until = None
+        self.cached_at = None
+        # Deadline kept across every time the runner parks this scan behind an open circuit
+        self.blocked = None
+        # scan_id of an interrupted run's submission, picked up by the batch runner
+        self.resume_id = None
+
+        self.utils = Utils()
+        self.timer = ScanTimer()
+        self.status_result = None
+        self.scan_result = None
+
+    def msg(self, text, level):
+        self.utils.msg(text, level, host=self.options.target, scan_id=self.scan_id, state=self.state)
+
+    async def request(self, method, budget, url, **kwargs):
+        """Send one API call through the rate limiter and circuit breaker, retrying transient failures"""
+        limiter = get_limiter(budget)
+        breaker = get_breaker()
+        action = url[len(self.base):].split('?', 1)[0]
+        for attempt in range(config.API_RETRY_ATTEMPTS + 1):
+            last = attempt == config.API_RETRY_ATTEMPTS
+            delay = limiter.reserve()
+            self.timer.waited(budget, delay)
+            await asyncio.sleep(delay)
+            probe = breaker.before_call()
+            started = time.perf_counter()
+            try:
+                async with self.session.request(method, url, **kwargs) as response:
+                    self.timer.call(method, action, time.perf_counter() - started)
+                    if response.status == 429:
+                        # Throttling means the API is up; the limiter handles the wait
+                        breaker.record_success()
+                        retry_after = parse_retry_after(response.headers.get('Retry-After'))
+                        limiter.throttled(retry_after)
+                        self.timer.retry('429')
+                        self.msg(f'Rate limited by the API, backing off{f" {retry_after:.0f} seconds" if retry_after else ""}', 'warn')
+                    elif response.status in TRANSIENT_STATUS:
+                        breaker.record_failure()
+                        if last:
+                            response.raise_for_status()
+                    else:
+                        breaker.record_success()
+                        limiter.succeeded()
+                        # Got through, so a later outage starts a fresh deadline
+                        self.blocked = None
+                        response.raise_for_status()
+                        return await response.json(content_type=None)
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as err:
+                breaker.record_failure()
+                if last:
+                    raise
+                delay = backoff_delay(attempt)
+                self.timer.retry(err.__class__.__name__)
+                self.msg(f'{err.__class__.__name__} talking to the API, retrying in {delay:.1f} seconds', 'warn')
+                await asyncio.sleep(delay)
+                continue
+            except BaseException:
+                # A probe that never got an answer must not hold the half-open breaker forever
+                if probe:
+                    breaker.abandon()
+                raise
+            if response.status != 429 and not last:
+                delay = backoff_delay(attempt)
+                self.timer.retry(str(response.status))
+                self.msg(f'API returned {response.status}, retrying in {delay:.1f} seconds', 'warn')
+                await asyncio.sleep(delay)
+        response.raise_for_status()
+
+    async def make_post(self, action, params):
+        try:
+            result = await self.request('POST', 'analyze', f'{self.base}{action}', params={'host': self.options.target}, data=params)
+            if self.options.verbosity:
+                self.msg(f'Scan initiation response: {result}', 'verbose')
+            return result
+        except aiohttp.ClientResponseError as http_err:
+            self.msg(f'HTTP error occurred: {http_err}', 'error')
+            raise
+        except CircuitOpenError:
+            # Not a failure of this scan; the runner parks it until the API is back
+            raise
+        except Exception as err:
+            self.msg(f'Other error occurred: {err}', 'error')
+            raise
+
+    async def make_get(self, action, params):
+        try:
+            result = await self.request('GET', 'results', f'{self.base}{action}', params=params)
+            if self.options.verbosity:
+                self.msg(f'{action} response: {result}', 'verbose')
+            return result
+        except aiohttp.ClientResponseError as http_err:
+            self.msg(f'HTTP error occurred: {http_err}', 'error')
+            raise
+        except CircuitOpenError:
+            raise
+        except Exception as err:
+            self.msg(f'Other error occurred: {err}', 'error')
+            raise
+
+    async def begin(self):
+        if self.load_cached():
+            return
+
+        result = await self.make_post('analyze', {'hidden': 'true', 'rescan': 'true'})
+
+        if "error" in result:
+            err = result['text']
+            if "cooldown" not in err:
+                self.msg(err, 'error')
+                raise Exception(err)
+            if self.running != 'cooldown':
+                self.msg(f'{self.options.target} is in cooldown. Waiting {config.SCAN_COOLDOWN_WAIT} seconds as required by the API.', 'warn')
+            self.running = 'cooldown'
+            self.timer.cooldown_started()
+            self.cooldown_until = time.monotonic() + config.SCAN_COOLDOWN_WAIT
+        elif 'scan' in result and result['scan'] and result['scan'].get('error') is None:
+            # Scan is already complete
+            self.scan_id = result['scan']['id']
+            self.scan_result = result['tests']
+            self.running = False
+            self.end = time.time()
+            self.timer.finished(self.end - self.start)
+            self.store_cached()
+        else:
+            self.state = result.get('state', 'UNKNOWN')
+            self.timer.state_changed(self.state)
+            self.scan_id = result.get('scan_id')
+
+    async def resume(self, scan_id):
+        """Pick up a scan submitted by an earlier run instead of starting a new one"""
+        self.scan_id = scan_id
+        try:
+            result = await self.request('GET', 'results', f'{self.base}getScanResults', params={'scan': scan_id})
+        except aiohttp.ClientResponseError as err:
+            if err.status == 404:
+                return
+            result = None
+        if result and 'error' not in result:
+            self.msg(f'Resumed scan {scan_id} of {self.options.target}', 'info')
+            self.scan_result = result
+            self.running = False
+            self.end = time.time()
+            self.timer.finished(self.end - self.start)
+            self.store_cached()
+        else:
+            # Not finished yet: keep polling it rather than submitting a new analyze
+            self.state = 'PENDING'
+            self.timer.state_changed(self.state)
+
+    async def check_results(self):
+        self.status_result = await self.make_get('analyze', {'host': self.options.target})
+        self.timer.poll()
+
+        if 'error' in self.status_result:
+            self.msg(self.status_result['text'], 'error')
+        else:
+            self.state = self.status_result['state']
+            self.timer.state_changed(self.state)
+
+        if self.state == 'FINISHED':
+            await self.check_tests()
+
+    async def check_tests(self):
+        self.scan_result = await self.make_get('getScanResults', {'scan': self.scan_id})
+        self.running = False
+        self.end = time.time()
+        self.timer.finished(self.end - self.start)
+        self.store_cached()
+
+    def load_cached(self):
+        if self.cache is None:
+            return False
+        hit = self.cache.get(self.options.target, getattr(self.options, 'max_age', None), self.base)
+        if hit is None:
+            return False
+        self.scan_id, self.scan_result, self.cached_at = hit
+        self.msg(f'Using cached results for {self.options.target} from {int(time.time() - self.cached_at)} seconds ago', 'info')
+        self.running = False
+        self.end = time.time()
+        self.timer.finished(0, cached=True)
+        return True
+
+    def store_cached(self):
+        if self.cache is not None and self.scan_result is not None:
+            self.cache.put(self.options.target, self.scan_id, self.scan_result, self.base)
+
+    async def wait(self, policy=None):
+        """Poll until the scan finishes, paced by a PollPolicy"""
+        if policy is None:
+            policy = PollPolicy(getattr(self.options, 'scan_timeout', None))
+        policy.start()
+        while self.running:
+            if self.running == 'cooldown':
+                await asyncio.sleep(max(0, self.cooldown_until - time.monotonic()))
+                await self.rescan()
+                policy.start()
+                continue
+            policy.check(self.options.target)
+            await asyncio.sleep(policy.next_delay(self.state))
+            await self.check_results()
+
+    async def rescan(self):
+        if self.running == 'cooldown':
+            self.timer.cooldown_ended()
+        self.running = True
+        await self.begin()
+
+
+def make_async_session(limit=None):
+    """Build a keep-alive aiohttp session with a pooled, compressed connection to the API"""
+    connector = aiohttp.TCPConnector(
+        limit=max(limit or 0, config.API_POOL_MAXSIZE),
+        keepalive_timeout=config.API_TIMEOUT,
+    )
+    return aiohttp.ClientSession(
+        connector=connector,
+        timeout=aiohttp.ClientTimeout(total=config.API_TIMEOUT),
+        headers={'Accept': 'application/json', 'Accept-Encoding': 'gzip, deflate'},
+    )
+
+
+class AsyncBatchRunner(BaseBatchRunner):
+    """Run many scans on one event loop with a bounded number in flight"""
+
+    async def scan_target(self, session, target):
+        scan = AsyncScanner(self.make_options(target), session)
+        scan.resume_id = self.resume.get(target)
+        return await self.advance(scan)
+
+    async def advance(self, scan):
+        """Drive a scan until it finishes, hits a cooldown or the API circuit opens"""
+        try:
+            if scan.resume_id is not None:
+                # Inside the try so an open circuit parks the scan with its scan_id kept
+                await scan.resume(scan.resume_id)
+                scan.resume_id = None
+            if scan.running == 'cooldown' or (scan.running and scan.state is None):
+                await scan.rescan()
+                self.submitted(scan)
+            # A cooled-down scan goes back to run() to be parked, freeing its slot
+            if scan.running != 'cooldown':
+                await scan.wait()
+        except CircuitOpenError:
+            self.blocked(scan)
+        return scan
+
+    async def run(self):
+        """Yield (target, scanner, error) tuples as each scan completes"""
+        batch = BatchState(self)
+        async with make_async_session(self.concurrency) as session:
+            try:
+                while True:
+                    # Only keep `concurrency` coroutines alive so memory stays flat
+                    for scan in batch.ready():
+                        batch.lead(asyncio.ensure_future(self.advance(scan)), scan.options.target)
+                    for target in batch.start(wrap=asyncio.wrap_future):
+                        batch.lead(asyncio.ensure_future(self.scan_target(session, target)), target)
+                    if batch.idle():
+                        if batch.done():
+                            break
+                        await asyncio.sleep(batch.delay() or 0)
+                        continue
+
+                    done, _ = await asyncio.wait(batch.waiting(), timeout=batch.delay(), return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        for result in batch.finished(task):
+                            yield result
+            finally:
+                for task in batch.pending:
+                    task.cancel()
+                # A caller that stops iterating early must not leave later scans of these hosts waiting forever
+                batch.abandon()
@@ -0,0 +1,190 @@
+#!/usr/bin/env python
+
+import sys
+import time
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from scanner import Scanner
+from polling import PollPolicy, ScanCancelled
+from session import configure_session
+from scheduler import CooldownScheduler
+from singleflight import get_registry
+from retry import CircuitOpenError, get_breaker
+import config
+
+
+def read_targets(path):
+    """Yield targets from a file, one per line ('-' reads stdin)"""
+    handle = sys.stdin if path == '-' else open(path, 'r')
+    try:
+        for line in handle:
+            target = line.split('#', 1)[0].strip()
+            if not target:
+                continue
+            yield target
+    finally:
+        if handle is not sys.stdin:
+            handle.close()
+
+
+class BatchState:
+    """The pending leaders, followers and parked scans of one run(), whichever engine drives it"""
+
+    def __init__(self, runner):
+        self.runner = runner
+        self.registry = get_registry()
+        self.breaker = get_breaker()
+        self.parked = CooldownScheduler()
+        self.targets = iter(runner.targets)
+        self.exhausted = False
+        # future or task -> target it leads, and shared flight -> targets following it
+        self.pending = {}
+        self.followers = {}
+
+    def ready(self):
+        """Parked scans whose wait is over, up to the free slots; they go ahead of new targets"""
+        return self.parked.pop_ready(self.runner.concurrency - len(self.pending))
+
+    def start(self, wrap=None):
+        """Yield new targets this run leads while there is room; wrap adapts a follower's flight"""
+        # Start no new hosts while the API is failing
+        while len(self.pending) < self.runner.concurrency and not self.exhausted and not self.breaker.retry_in():
+            target = next(self.targets, None)
+            if target is None:
+                self.exhausted = True
+                return
+            flight, leader = self.registry.join(target, self.runner.base)
+            if leader:
+                yield target
+            else:
+                # Someone is already scanning this host; wait for theirs
+                self.followers.setdefault(wrap(flight) if wrap else flight, []).append(target)
+
+    def lead(self, handle, target):
+        self.pending[handle] = target
+
+    def idle(self):
+        return not self.pending and not self.followers
+
+    def done(self):
+        return self.idle() and self.exhausted and not self.parked
+
+    def waiting(self):
+        return list(self.pending) + list(self.followers)
+
+    def delay(self):
+        """Seconds until a parked scan is due or the breaker lets calls through, or None"""
+        delays = [delay for delay in (self.parked.next_delay(), self.breaker.retry_in()) if delay]
+        return min(delays) if delays else None
+
+    def finished(self, handle):
+        """Return the (target, scanner, error) results of a completed future or task"""
+        if handle in self.followers:
+            err = handle.exception()
+            return [(target, None if err else handle.result(), err) for target in self.followers.pop(handle)]
+        target = self.pending.pop(handle)
+        err = handle.exception()
+        if err is not None:
+            self.registry.finish(target, error=err, base=self.runner.base)
+            return [(target, None, err)]
+        scan = handle.result()
+        if scan.running == 'cooldown':
+            self.parked.park(scan, scan.cooldown_until)
+        elif scan.running:
+            self.parked.park(scan, time.monotonic() + self.breaker.retry_in())
+        else:
+            self.registry.finish(target, scan, base=self.runner.base)
+            return [(target, scan, None)]
+        return []
+
+    def abandon(self):
+        """Fail the registry flights of scans this run leads but will not finish"""
+        stopped = ScanCancelled('The batch stopped before this scan finished')
+        for target in [*self.pending.values(), *(scan.options.target for scan in self.parked.drain())]:
+            self.registry.finish(target, error=stopped, base=self.runner.base)
+
+
+class BaseBatchRunner:
+    """What the thread and asyncio batch runners share; subclasses supply advance() and run()"""
+
+    def __init__(self, options, targets, concurrency=None, journal=None, resume=None):
+        self.options = options
+        self.targets = targets
+        self.concurrency = max(1, concurrency or config.BATCH_CONCURRENCY)
+        self.journal = journal
+        # host -> scan_id submitted by an interrupted run
+        self.resume = resume or {}
+        self.base = getattr(options, 'api_base', None)
+
+    def make_options(self, target):
+        opts = argparse.Namespace(**vars(self.options))
+        opts.target = target
+        return opts
+
+    def submitted(self, scan):
+        if self.journal is not None and scan.scan_id is not None:
+            self.journal.submitted(scan.options.target, scan.scan_id)
+
+    def blocked(self, scan):
+        """Leave a scan the open circuit stopped running, so run() parks it, unless its timeout has passed"""
+        if scan.blocked is None:
+            scan.blocked = PollPolicy(getattr(self.options, 'scan_timeout', None))
+        scan.blocked.check(scan.options.target)
+
+
+class BatchRunner(BaseBatchRunner):
+    """Run many scans at once on a bounded worker pool"""
+
+    def __init__(self, options, targets, concurrency=None, journal=None, resume=None):
+        super().__init__(options, targets, concurrency, journal, resume)
+        # Set when run() stops early so worker threads give up their scans
+        self.cancel = threading.Event()
+
+    def scan_target(self, target):
+        scan = Scanner(self.make_options(target), cancel=self.cancel)
+        scan.resume_id = self.resume.get(target)
+        return self.advance(scan)
+
+    def advance(self, scan):
+        """Drive a scan until it finishes, hits a cooldown or the API circuit opens"""
+        try:
+            if scan.resume_id is not None:
+                # Inside the try so an open circuit parks the scan with its scan_id kept
+                scan.resume(scan.resume_id)
+                scan.resume_id = None
+            if scan.running == 'cooldown' or (scan.running and scan.state is None):
+                scan.rescan()
+                self.submitted(scan)
+            # A cooled-down scan goes back to run() to be parked, freeing this worker
+            if scan.running != 'cooldown':
+                scan.wait()
+        except CircuitOpenError:
+            self.blocked(scan)
+        return scan
+
+    def run(self):
+        """Yield (target, scanner, error) tuples as each scan completes"""
+        configure_session(self.concurrency)
+        batch = BatchState(self)
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            try:
+                while True:
+                    for scan in batch.ready():
+                        batch.lead(pool.submit(self.advance, scan), scan.options.target)
+                    for target in batch.start():
+                        batch.lead(pool.submit(self.scan_target, target), target)
+                    if batch.idle():
+                        if batch.done():
+                            break
+                        time.sleep(batch.delay() or 0)
+                        continue
+
+                    done, _ = wait(batch.waiting(), timeout=batch.delay(), return_when=FIRST_COMPLETED)
+                    for future in done:
+                        for result in batch.finished(future):
+                            yield result
+            finally:
+                self.cancel.set()
+                # A caller that stops iterating early must not leave later scans of these hosts waiting forever
+                batch.abandon()
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+
+"""
+Offline benchmark for the scan cycle against mock_api.py.
+
+Starts the mock API in a subprocess, scans --hosts synthetic domains
+through the same batch runners as `main.py --cli -f`, and reports
+scans/sec, API calls per scan, p50/p99 completion latency and peak RSS.
+Polling, cooldown and retry delays are multiplied by --time-scale, and
+client-side rate limits are lifted unless --rate-limit is given, so a run
+measures the client rather than the configured pacing.
+
+Usage: python3 bench.py [--hosts N] [--concurrency N] [--engine threads|async] [--json]
+                        [--latency S] [--pending S] [--running S] [--error-rate P] ...
+"""
+
+import os
+import sys
+import json
+import math
+import time
+import argparse
+import subprocess
+import urllib.request
+import config
+
+# Scaled by --time-scale so a run takes seconds rather than minutes
+SCALED_DELAYS = ['SCAN_POLL_INITIAL', 'SCAN_CHECK_INTERVAL', 'SCAN_POLL_MAX', 'SCAN_COOLDOWN_WAIT', 'API_RETRY_BACKOFF', 'API_BREAKER_RESET']
+
+MOCK_FLAGS = ['latency', 'pending', 'running', 'instant_rate', 'cooldown_rate', 'error_rate', 'throttle_rate', 'seed']
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a sorted list"""
+    if not values:
+        return None
+    return round(values[max(0, math.ceil(fraction * len(values)) - 1)], 4)
+
+
+def peak_rss_mb():
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return round(peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024, 1)
+
+
+def start_mock(options):
+    """Run mock_api.py on a free port and return (process, api base URL)"""
+    here = os.path.dirname(os.path.abspath(__file__))
+    command = [sys.executable, os.path.join(here, 'mock_api.py'), '--port', '0']
+    for name in MOCK_FLAGS:
+        value = getattr(options, name)
+        if value is not None:
+            command += [f'--{name.replace("_", "-")}', str(value)]
+    proc = subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+    line = proc.stdout.readline()
+    if not line.startswith('Listening on '):
+        proc.kill()
+        raise RuntimeError(f'mock_api.py did not start: {line!r}')
+    return proc, line.split()[-1]
+
+
+def api_stats(base):
+    root = base.split('/api/', 1)[0]
+    with urllib.request.urlopen(f'{root}/__stats') as response:
+        return json.load(response)
+
+
+def configure(options):
+    for name in SCALED_DELAYS:
+        setattr(config, name, getattr(config, name) * options.time_scale)
+    if not options.rate_limit:
+        config.API_RATE_LIMITS = {budget: (1e6, 1e6) for budget in config.API_RATE_LIMITS}
+
+
+def run_batch(options, base, targets):
+    """Scan targets and return (elapsed seconds, per-scan latencies, failures)"""
+    scan_options = argparse.Namespace(
+        target=None, verbosity=False, use_cache=False, max_age=None,
+        scan_timeout=options.scan_timeout, api_base=base,
+    )
+    latencies = []
+    failures = 0
+
+    def record(target, scan, err):
+        nonlocal failures
+        if err is not None:
+            failures += 1
+        else:
+            latencies.append(scan.end - scan.start)
+
+    started = time.perf_counter()
+    if options.engine == 'async':
+        import asyncio
+        from async_scanner import AsyncBatchRunner
+
+        async def run_async():
+            async for result in AsyncBatchRunner(scan_options, targets, options.concurrency).run():
+                record(*result)
+
+        asyncio.run(run_async())
+    else:
+        from batch import BatchRunner
+
+        for result in BatchRunner(scan_options, targets, options.concurrency).run():
+            record(*result)
+    return time.perf_counter() - started, sorted(latencies), failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the scan cycle against a local mock API")
+    parser.add_argument("--hosts", type=int, default=200, help="Synthetic hosts to scan")
+    parser.add_argument("--concurrency", type=int, default=config.BATCH_CONCURRENCY, help="Scans in flight at once")
+    parser.add_argument("--engine", choices=["threads", "async"], default=config.BATCH_ENGINE, help="Batch engine to benchmark")
+    parser.add_argument("--scan-timeout", type=int, default=config.SCAN_TIMEOUT, help="Per-scan timeout in seconds")
+    parser.add_argument("--time-scale", type=float, default=0.05, help="Multiplier for poll, cooldown and retry delays")
+    parser.add_argument("--rate-limit", action="store_true", help="Keep the client-side rate limits from config.py")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    mock = parser.add_argument_group("mock API")
+    mock.add_argument("--latency", type=float, default=0.01, help="Mean seconds added to every response")
+    mock.add_argument("--pending", type=float, default=0.5, help="Seconds a new scan reports PENDING")
+    mock.add_argument("--running", type=float, default=0.25, help="Seconds a scan then reports RUNNING")
+    mock.add_argument("--instant-rate", type=float, default=None, help="Share of analyze calls that finish at once")
+    mock.add_argument("--cooldown-rate", type=float, default=None, help="Share of analyze calls answered with a cooldown")
+    mock.add_argument("--error-rate", type=float, default=None, help="Share of calls answered with HTTP 503")
+    mock.add_argument("--throttle-rate", type=float, default=None, help="Share of calls answered with HTTP 429")
+    mock.add_argument("--seed", type=int, default=1, help="Seed for the mock's fault injection")
+    options = parser.parse_args()
+
+    configure(options)
+    # Warnings about injected faults go to stderr so the report stays readable
+    from log import setup_logging
+    setup_logging(stream=sys.stderr)
+
+    proc, base = start_mock(options)
+    try:
+        targets = (f'host{index}.bench.test' for index in range(options.hosts))
+        elapsed, latencies, failures = run_batch(options, base, targets)
+        stats = api_stats(base)
+    finally:
+        proc.terminate()
+        proc.wait()
+
+    report = {
+        'engine': options.engine,
+        'hosts': options.hosts,
+        'concurrency': options.concurrency,
+        'failed': failures,
+        'elapsed_s': round(elapsed, 3),
+        'scans_per_s': round(len(latencies) / elapsed, 2) if elapsed else None,
+        'calls_per_scan': round(stats['total'] / options.hosts, 2) if options.hosts else None,
+        'calls': stats['calls'],
+        'p50_s': percentile(latencies, 0.50),
+        'p99_s': percentile(latencies, 0.99),
+        'peak_rss_mb': peak_rss_mb(),
+    }
+    if options.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(f"{report['hosts']} hosts, {report['engine']} engine, concurrency {report['concurrency']}: {report['failed']} failed")
+        print(f"  scans/sec:      {report['scans_per_s']}")
+        print(f"  calls/scan:     {report['calls_per_scan']}  {report['calls']}")
+        if latencies:
+            print(f"  latency p50/p99: {report['p50_s']:.3f}s / {report['p99_s']:.3f}s")
+        if report['peak_rss_mb'] is not None:
+            print(f"  peak RSS:       {report['peak_rss_mb']:.1f} MB")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+
+import os
+import json
+import time
+import threading
+import config
+
+
+_cache = None
+_lock = threading.Lock()
+
+
+def cache_key(host):
+    return host.strip().lower().rstrip('.')
+
+
+def entry_key(host, base=None):
+    """Cache row key for host; results from another API base are stored apart from the Observatory's"""
+    key = cache_key(host)
+    if base and base != config.API_BASE_URL:
+        key = f'{base} {key}'
+    return key
+
+
+class ResultCache:
+    """On-disk SQLite cache of getScanResults payloads keyed by host"""
+
+    def __init__(self, path=None, ttl=None, max_entries=None):
+        self.path = os.path.expanduser(path or config.CACHE_PATH)
+        self.ttl = config.CACHE_TTL if ttl is None else ttl
+        self.max_entries = config.CACHE_MAX_ENTRIES if max_entries is None else max_entries
+        self.lock = threading.Lock()
+
+        import sqlite3
+        if self.path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self.conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS results ('
+            ' host TEXT PRIMARY KEY,'
+            ' scan_id INTEGER,'
+            ' scanned_at REAL NOT NULL,'
+            ' accessed_at REAL NOT NULL,'
+            ' payload TEXT NOT NULL)'
+        )
+        self.conn.execute('CREATE INDEX IF NOT EXISTS results_accessed ON results (accessed_at)')
+
+    def get(self, host, max_age=None, base=None):
+        """Return (scan_id, payload, scanned_at) if a fresh enough entry exists"""
+        max_age = self.ttl if max_age is None else max_age
+        if max_age <= 0:
+            return None
+        now = time.time()
+        key = entry_key(host, base)
+        with self.lock:
+            row = self.conn.execute(
+                'SELECT scan_id, payload, scanned_at FROM results WHERE host = ? AND scanned_at >= ?',
+                (key, now - max_age),
+            ).fetchone()
+            if row is None:
+                return None
+            self.conn.execute('UPDATE results SET accessed_at = ? WHERE host = ?', (now, key))
+        return row[0], json.loads(row[1]), row[2]
+
+    def put(self, host, scan_id, payload, base=None):
+        now = time.time()
+        with self.lock:
+            self.conn.execute(
+                'INSERT OR REPLACE INTO results (host, scan_id, scanned_at, accessed_at, payload) VALUES (?, ?, ?, ?, ?)',
+                (entry_key(host, base), scan_id, now, now, json.dumps(payload, separators=(',', ':'))),
+            )
+            self.evict()
+
+    def evict(self):
+        """Drop the least recently used entries beyond max_entries"""
+        # Age is left to get(): a --max-age above the TTL must still find older entries
+        if self.max_entries:
+            self.conn.execute(
+                'DELETE FROM results WHERE host IN ('
+                ' SELECT host FROM results ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)',
+                (self.max_entries,),
+            )
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+def get_cache():
+    """Return the result cache shared by every Scanner in this process"""
+    global _cache
+    if _cache is None:
+        with _lock:
+            if _cache is None:
+                _cache = ResultCache()
+    return _cache
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+
+"""
+Import-time budget check for the --cli path.
+
+Imports the modules a cached or failing CLI run touches in a fresh
+interpreter under ``python -X importtime`` and exits non-zero when they
+take longer than the budget or load a dependency that should be deferred.
+
+Usage: python3 check_import_time.py [--budget MS] [--runs N]
+"""
+
+import os
+import sys
+import argparse
+import statistics
+import subprocess
+import config
+
+# What `main.py --cli -u HOST` imports before it knows whether it will hit the cache
+CLI_MODULES = ['main', 'utils', 'scanner', 'writers']
+
+# Only loaded once a request is sent, a table is rendered or the GUI starts
+DEFERRED_MODULES = ['requests', 'rich', 'aiohttp', 'PySide6']
+
+
+def measure():
+    """Return (total microseconds, imported module names) for one fresh interpreter"""
+    here = os.path.dirname(os.path.abspath(__file__))
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {", ".join(CLI_MODULES)}'],
+        cwd=here, capture_output=True, text=True, check=True,
+    )
+    total = 0
+    modules = set()
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line.split('|')
+        modules.add(name.strip())
+        # Top-level entries (a single leading space) already include their children
+        if name.strip() in CLI_MODULES and len(name) - len(name.lstrip()) == 1:
+            total += int(cumulative)
+    return total, modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the --cli import-time budget")
+    parser.add_argument("--budget", type=float, default=config.CLI_IMPORT_BUDGET_MS, help="Budget in milliseconds")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters to take the median of")
+    options = parser.parse_args()
+
+    samples = []
+    loaded = set()
+    for _ in range(options.runs):
+        total, modules = measure()
+        samples.append(total / 1000)
+        loaded |= modules
+    median = statistics.median(samples)
+
+    failures = []
+    if median > options.budget:
+        failures.append(f"--cli imports took {median:.1f}ms, over the {options.budget:.0f}ms budget")
+    for name in DEFERRED_MODULES:
+        if name in loaded:
+            failures.append(f"{name} is imported eagerly on the --cli path")
+
+    print(f"--cli import time: {median:.1f}ms (budget {options.budget:.0f}ms, median of {options.runs})")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -5,21 +5,76 @@ Configuration settings for HTTP Security Observer
 """
 
 # API Configuration
-API_BASE_URL = 'https://http-observatory.security.mozilla.org/api/v1/'
+API_BASE_URL = 'https://observatory-api.mdn.mozilla.net/api/v2/'
 API_TIMEOUT = 30  # seconds
 API_RETRY_ATTEMPTS = 3
+API_RETRY_BACKOFF = 1.0  # seconds before the first retry, doubled on each attempt
+API_RETRY_MAX_DELAY = 30  # upper bound on the delay between retries
+API_BREAKER_THRESHOLD = 5  # consecutive failures that open the circuit breaker
+API_BREAKER_RESET = 30  # seconds the breaker stays open before probing the API again
+API_POOL_CONNECTIONS = 4  # distinct hosts kept in the connection pool
+API_POOL_MAXSIZE = 16  # keep-alive connections per host
+API_RATE_LIMITS = {  # budget: (requests per second, burst)
+    'analyze': (1.0, 5),
+    'results': (10.0, 20),
+}
+API_RATE_MIN_FRACTION = 0.1  # throttling never slows a budget below this share of its rate
+API_RATE_RECOVERY = 0.05  # share of the rate regained after each accepted call
 
 # Scan Configuration
-SCAN_CHECK_INTERVAL = 5  # seconds between status checks
+SCAN_CHECK_INTERVAL = 5  # seconds between status checks while PENDING
+SCAN_POLL_INITIAL = 1  # seconds before the first check, and between checks while RUNNING
+SCAN_POLL_MAX = 30  # upper bound on the backoff between status checks
+SCAN_POLL_BACKOFF = 1.5  # multiplier applied while the state does not change
+SCAN_POLL_JITTER = 0.25  # +/- fraction of randomness added to each delay
+SCAN_TIMEOUT = 600  # seconds before a scan is reported as timed out (0 disables)
 SCAN_COOLDOWN_WAIT = 180  # seconds to wait during cooldown
 
+# Batch Configuration
+BATCH_CONCURRENCY = 8  # scans in flight at once in --targets-file mode
+BATCH_ENGINE = 'threads'  # 'threads' or 'async'
+
+# Cache Configuration
+CACHE_PATH = '~/.cache/security-observer/results.sqlite3'
+CACHE_TTL = 3600  # seconds a cached result stays fresh
+CACHE_MAX_ENTRIES = 10000  # least recently used hosts are evicted beyond this
+
+# History Configuration
+HISTORY_PATH = '~/.cache/security-observer/history.sqlite3'  # append-only log of every scan's test outcomes
+ARCHIVE_PATH = '~/.cache/security-observer/archive'  # columnar copy of the same outcomes, read by the stats command
+ARCHIVE_NAME_CACHE = 4096  # host and test ids an archive writer keeps in memory; the rest are looked up on disk
+
 # Output Configuration
 MAX_DESCRIPTION_LENGTH = 80
-DEFAULT_OUTPUT_FORMAT = 'table'  # 'table', 'json', 'csv'
+DEFAULT_OUTPUT_FORMAT = 'table'  # 'table', 'json', 'ndjson', 'csv'
 
 # Validation
-ALLOWED_DOMAINS = []  # Empty list means all domains allowed
-BLOCKED_DOMAINS = []  # Domains to block
+ALLOWED_DOMAINS = []  # Empty list means all domains allowed; 'example.com' covers its subdomains, '*.example.com' only them
+BLOCKED_DOMAINS = []  # Domains to block, with the same rule syntax
+TARGETS_DEDUP_MEMORY = 100000  # distinct hosts remembered in RAM while reading a target list before spilling to disk
+
+# Spill Configuration
+SPILL_COMPRESSION = 6  # zlib level for payloads written to a spill file
+SPILL_COMPACT_RATIO = 3  # rewrite a spill once it is this many times the size of its live payloads
+SPILL_COMPACT_MIN = 64 * 1024 * 1024  # bytes a spill may reach before it is worth compacting
+
+# Daemon Configuration
+DAEMON_MAX_AGE = 86400  # seconds before a host's results count as stale (divided by its importance)
+DAEMON_ERROR_RETRY = 900  # seconds before retrying a host whose scan failed
+DAEMON_INVENTORY_POLL = 60  # seconds between checks of the inventory file for changes
+DAEMON_LISTEN = '127.0.0.1:8642'  # address of the results endpoint, empty to disable
+DAEMON_SPILL_PATH = '~/.cache/security-observer/daemon.spill'  # latest raw payloads, kept on disk instead of in memory
+
+# GUI Configuration
+GUI_MAX_CONCURRENT_SCANS = 4  # hosts scanned at once from the GUI queue
+GUI_PROGRESS_INTERVAL = 250  # milliseconds between coalesced progress updates
+
+# Metrics
+METRICS_FILE = None  # write a Prometheus text file (or JSON for *.json) after each run
+METRICS_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)  # histogram bounds in seconds
+
+# Startup
+CLI_IMPORT_BUDGET_MS = 50  # check_import_time.py fails above this
 
 # Logging
 LOG_LEVEL = 'INFO'  # DEBUG, INFO, WARNING, ERROR
@@ -0,0 +1,261 @@
+#!/usr/bin/env python
+
+import os
+import json
+import time
+import heapq
+import signal
+import itertools
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, unquote
+from batch import BatchRunner, read_targets
+from scanner import Scanner
+from utils import Utils
+from session import configure_session
+from scheduler import CooldownScheduler
+from retry import get_breaker
+from cache import cache_key
+from targets import normalize_host
+from writers import summary_record
+from spill import PayloadSpill
+import config
+
+
+def read_inventory(path):
+    """Return {host: importance} from lines of 'host [importance]'"""
+    fleet = {}
+    for line in read_targets(path):
+        fields = line.split()
+        try:
+            importance = float(fields[1]) if len(fields) > 1 else 1.0
+        except ValueError:
+            importance = 1.0
+        host = normalize_host(fields[0])
+        if host:
+            fleet[host] = max(importance, 0.01)
+    return fleet
+
+
+class FleetDaemon(BatchRunner):
+    """Keep every host in an inventory rescanned within its target age"""
+
+    def __init__(self, options, inventory, max_age=None, concurrency=None, validate=None, spill=None):
+        super().__init__(options, [], concurrency)
+        self.inventory = inventory
+        self.max_age = max_age or config.DAEMON_MAX_AGE
+        self.validate = validate
+        self.fleet = {}
+        self.inventory_mtime = None
+        self.inventory_checked = 0
+        # Min-heap of (due wall time, seq, host); stale entries are skipped on pop
+        self.queue = []
+        self.due = {}
+        self.counter = itertools.count()
+        # Compact summaries only; each host's full payload is read back from the spill on demand
+        self.latest = {}
+        self.spill = PayloadSpill(spill or config.DAEMON_SPILL_PATH)
+        self.lock = threading.Lock()
+        self.stop = threading.Event()
+        self.on_result = None
+        self.utils = Utils()
+
+    def target_age(self, host):
+        """Important hosts are kept proportionally fresher"""
+        return self.max_age / self.fleet.get(host, 1.0)
+
+    def schedule(self, host, due):
+        self.due[host] = due
+        heapq.heappush(self.queue, (due, next(self.counter), host))
+
+    def reload_inventory(self, force=False):
+        """Re-read the inventory when its mtime changes; new hosts are due at once"""
+        now = time.monotonic()
+        if not force and now - self.inventory_checked < config.DAEMON_INVENTORY_POLL:
+            return
+        self.inventory_checked = now
+        try:
+            mtime = os.stat(self.inventory).st_mtime
+        except OSError as err:
+            self.utils.msg(f'Cannot read inventory: {err}', 'error')
+            return
+        if mtime == self.inventory_mtime:
+            return
+        self.inventory_mtime = mtime
+
+        fleet = read_inventory(self.inventory)
+        if self.validate is not None:
+            fleet = {host: weight for host, weight in fleet.items() if self.validate(host)}
+        added = fleet.keys() - self.fleet.keys()
+        removed = self.fleet.keys() - fleet.keys()
+        self.fleet = fleet
+        wall = time.time()
+        # Never-scanned hosts go out most important first
+        for host in sorted(added, key=lambda host: -fleet[host]):
+            self.schedule(host, wall)
+        with self.lock:
+            for host in removed:
+                self.due.pop(host, None)
+                self.latest.pop(host, None)
+                self.spill.discard(host)
+        self.utils.msg(f'Inventory has {len(fleet)} hosts ({len(added)} added, {len(removed)} removed)', 'info')
+
+    def pop_due(self, limit, busy):
+        """Remove and return up to `limit` hosts whose results are stale"""
+        ready = []
+        wall = time.time()
+        while self.queue and len(ready) < limit and self.queue[0][0] <= wall:
+            due, _, host = heapq.heappop(self.queue)
+            # Dropped from the inventory, rescheduled since, or already scanning
+            if self.due.get(host) != due or host in busy:
+                continue
+            ready.append(host)
+        return ready
+
+    def next_due(self):
+        if not self.queue:
+            return None
+        return max(0, self.queue[0][0] - time.time())
+
+    def make_options(self, target):
+        opts = super().make_options(target)
+        # A cached result younger than the target age is as good as a rescan
+        opts.max_age = self.target_age(target)
+        return opts
+
+    def scan_target(self, target):
+        return self.advance(Scanner(self.make_options(target), cancel=self.stop))
+
+    def record(self, host, scan, err):
+        """Keep the newest result or error for the HTTP endpoint and schedule the next scan"""
+        if host not in self.fleet:
+            return
+        if err is not None:
+            self.utils.msg(f'{host}: {err}', 'error', host=host)
+            with self.lock:
+                entry = self.latest.setdefault(host, {'host': host})
+                entry['error'] = str(err)
+                entry['error_at'] = time.time()
+            self.schedule(host, time.time() + min(config.DAEMON_ERROR_RETRY, self.target_age(host)))
+            return
+        scanned_at = scan.cached_at or time.time()
+        entry = summary_record(host, scan)
+        self.spill.put(host, scan.scan_result)
+        with self.lock:
+            self.latest[host] = entry
+        if self.spill.needs_compaction():
+            self.spill.compact()
+        self.schedule(host, scanned_at + self.target_age(host))
+        if self.on_result is not None:
+            self.on_result(host, scan)
+
+    def status(self):
+        wall = time.time()
+        with self.lock:
+            fresh = sum(1 for entry in self.latest.values() if 'scan_id' in entry and wall - entry['scanned_at'] <= self.target_age(entry['host']))
+        return {
+            'hosts': len(self.fleet),
+            'fresh': fresh,
+            'overdue': sum(1 for due in list(self.due.values()) if due <= wall),
+            'breaker_retry_in': get_breaker().retry_in(),
+        }
+
+    def run(self):
+        """Scan due hosts forever, parking cooldowns, until stop is set"""
+        configure_session(self.concurrency)
+        self.reload_inventory(force=True)
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            try:
+                self.loop(pool)
+            finally:
+                # Wake in-flight scans so the pool can shut down promptly
+                self.stop.set()
+        self.spill.close()
+
+    def loop(self, pool):
+        breaker = get_breaker()
+        parked = CooldownScheduler()
+        pending = {}
+        while not self.stop.is_set():
+            self.reload_inventory()
+            for scan in parked.pop_ready(self.concurrency - len(pending)):
+                pending[pool.submit(self.advance, scan)] = scan.options.target
+            if not breaker.retry_in():
+                busy = set(pending.values()) | {scan.options.target for _, _, scan in parked.heap}
+                for host in self.pop_due(self.concurrency - len(pending), busy):
+                    pending[pool.submit(self.scan_target, host)] = host
+
+            delays = [delay for delay in (self.next_due(), parked.next_delay(), breaker.retry_in()) if delay]
+            timeout = min(delays + [config.DAEMON_INVENTORY_POLL])
+            if not pending:
+                self.stop.wait(timeout)
+                continue
+
+            done, _ = wait(list(pending), timeout=timeout, return_when=FIRST_COMPLETED)
+            for future in done:
+                host = pending.pop(future)
+                try:
+                    scan = future.result()
+                except Exception as err:
+                    if not self.stop.is_set():
+                        self.record(host, None, err)
+                    continue
+                if scan.running == 'cooldown':
+                    parked.park(scan, scan.cooldown_until)
+                elif scan.running:
+                    parked.park(scan, time.monotonic() + breaker.retry_in())
+                else:
+                    self.record(host, scan, None)
+
+    def handle_signals(self):
+        """Stop cleanly on SIGTERM as well as Ctrl+C"""
+        signal.signal(signal.SIGTERM, lambda signum, frame: self.stop.set())
+
+
+class ResultsHandler(BaseHTTPRequestHandler):
+    """Read-only JSON view of a FleetDaemon's in-memory results"""
+
+    daemon = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_body(self, body, status=200, content_type='application/json'):
+        body = body.encode()
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        path = urlparse(self.path).path.rstrip('/')
+        if path in ('', '/status'):
+            return self.send_body(json.dumps(self.daemon.status()))
+        if path == '/metrics':
+            from metrics import get_metrics
+
+            return self.send_body(get_metrics().to_prometheus(), content_type='text/plain; version=0.0.4')
+        if path == '/hosts':
+            with self.daemon.lock:
+                summaries = list(self.daemon.latest.values())
+            return self.send_body(json.dumps(summaries))
+        if path.startswith('/hosts/'):
+            host = cache_key(unquote(path[len('/hosts/'):]))
+            with self.daemon.lock:
+                entry = self.daemon.latest.get(host)
+            if entry is not None:
+                tests = self.daemon.spill.get(host) if 'scan_id' in entry else None
+                return self.send_body(json.dumps(dict(entry, tests=tests) if tests is not None else entry))
+        self.send_body(json.dumps({'error': 'not found'}), 404)
+
+
+def serve_results(daemon, listen):
+    """Serve daemon's results over HTTP on 'host:port' from a background thread"""
+    host, _, port = listen.rpartition(':')
+    handler = type('Handler', (ResultsHandler,), {'daemon': daemon})
+    server = ThreadingHTTPServer((host or '127.0.0.1', int(port)), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='results-http', daemon=True).start()
+    return server
@@ -1,72 +1,98 @@
 #!/usr/bin/env python3
 
+import re
 import sys
 import threading
-import time
 from PySide6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
     QLabel, QLineEdit, QPushButton, QTextEdit, QProgressBar,
-    QGroupBox, QCheckBox, QFileDialog, QMessageBox, QTableWidget,
-    QTableWidgetItem, QHeaderView, QSplitter, QFrame
+    QGroupBox, QCheckBox, QFileDialog, QMessageBox, QTableView,
+    QAbstractItemView, QHeaderView, QSplitter, QFrame, QTableWidget, QTableWidgetItem
 )
-from PySide6.QtCore import Qt, QThread, Signal, QTimer
+from PySide6.QtCore import Qt, QObject, QRunnable, QThreadPool, Signal, QTimer
 from PySide6.QtGui import QFont, QIcon, QPalette, QColor
 from scanner import Scanner
+from polling import ScanCancelled
+from singleflight import get_registry
 from utils import Utils
+from normalize import normalize_results, summarize
+from results_model import ResultsModel, ResultsFilterProxy
+from targets import TargetPipeline, is_valid_domain
+from observer import ScanOptions
 import argparse
+import json
+import config
 
 
-class ScanWorker(QThread):
-    """Worker thread for running scans"""
-    progress_updated = Signal(str)
-    scan_completed = Signal(dict, float)
-    scan_error = Signal(str)
+class ScanSignals(QObject):
+    """Signals for one ScanTask; QRunnable cannot emit signals itself"""
+    progress_updated = Signal(str, str)
+    scan_completed = Signal(str, dict, float)
+    scan_error = Signal(str, str)
+    scan_cancelled = Signal(str)
+
+
+class ScanTask(QRunnable):
+    """One queued host scan, run on the window's QThreadPool"""
     
     def __init__(self, target, verbose=False, output_file=None):
         super().__init__()
+        self.setAutoDelete(False)
         self.target = target
         self.verbose = verbose
         self.output_file = output_file
+        self.cancel = threading.Event()
+        self.signals = ScanSignals()
         self.scanner = None
         
     def run(self):
-        try:
-            # Create a mock options object for the scanner
-            class Options:
-                def __init__(self, target, verbose, output_file):
-                    self.target = target
-                    self.verbosity = verbose
-                    self.write = output_file
+        if self.cancel.is_set():
+            self.signals.scan_cancelled.emit(self.target)
+            return
             
-            options = Options(self.target, self.verbose, self.output_file)
-            self.scanner = Scanner(options)
+        try:
+            options = ScanOptions(self.target, use_cache=False, verbose=self.verbose)
             
-            self.progress_updated.emit(f"Starting scan for {self.target}...")
-            self.scanner.begin()
+            def scan():
+                scanner = Scanner(options, cancel=self.cancel)
+                self.signals.progress_updated.emit(self.target, "Starting scan...")
+                scanner.begin()
+                
+                # Monitor scan progress
+                scanner.wait(on_poll=lambda s: self.signals.progress_updated.emit(self.target, f"Scan status: {s.state}"))
+                return scanner
             
-            # Monitor scan progress
-            while self.scanner.running:
-                if self.scanner.running == 'cooldown':
-                    self.progress_updated.emit("Domain is in cooldown. Waiting...")
-                    time.sleep(5)
-                else:
-                    self.progress_updated.emit("Checking scan status...")
-                    self.scanner.check_results()
-                    time.sleep(5)
+            # Share the result if a batch is already scanning this host
+            self.scanner = get_registry().run(self.target, scan)
             
             # Scan completed
             elapsed_time = self.scanner.end - self.scanner.start
-            self.scan_completed.emit(self.scanner.scan_result, elapsed_time)
+            self.signals.scan_completed.emit(self.target, self.scanner.scan_result, elapsed_time)
             
+        except ScanCancelled:
+            self.signals.scan_cancelled.emit(self.target)
         except Exception as e:
-            self.scan_error.emit(str(e))
+            self.signals.scan_error.emit(self.target, str(e))
 
 
 class SecurityObserverGUI(QMainWindow):
     def __init__(self):
         super().__init__()
-        self.scan_worker = None
+        # Hosts are queued on a bounded pool; tasks maps host -> ScanTask still queued or running
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(config.GUI_MAX_CONCURRENT_SCANS)
+        self.tasks = {}
+        self.queue_rows = {}
+        self.finished_count = 0
+        self.scanned_hosts = 0
+        self.totals = [0, 0, 0, 0]
+        # Progress from workers is buffered and flushed to the UI on a timer
+        self.pending_log = []
+        self.pending_status = {}
         self.init_ui()
+        self.progress_timer = QTimer(self)
+        self.progress_timer.setInterval(config.GUI_PROGRESS_INTERVAL)
+        self.progress_timer.timeout.connect(self.flush_progress)
         
     def init_ui(self):
         self.setWindowTitle("HTTP Security Observer")
@@ -95,9 +121,10 @@ class SecurityObserverGUI(QMainWindow):
         
         # Domain input
         domain_layout = QHBoxLayout()
-        domain_label = QLabel("Domain:")
+        domain_label = QLabel("Domains:")
         self.domain_input = QLineEdit()
-        self.domain_input.setPlaceholderText("Enter domain (e.g., example.com)")
+        self.domain_input.setPlaceholderText("Enter one or more domains (e.g., example.com, example.org)")
+        self.domain_input.returnPressed.connect(self.start_scan)
         domain_layout.addWidget(domain_label)
         domain_layout.addWidget(self.domain_input)
         input_layout.addLayout(domain_layout)
@@ -126,9 +153,9 @@ class SecurityObserverGUI(QMainWindow):
         
         # Control buttons
         button_layout = QHBoxLayout()
-        self.scan_button = QPushButton("Start Scan")
+        self.scan_button = QPushButton("Add to Queue")
         self.scan_button.clicked.connect(self.start_scan)
-        self.stop_button = QPushButton("Stop Scan")
+        self.stop_button = QPushButton("Stop All")
         self.stop_button.clicked.connect(self.stop_scan)
         self.stop_button.setEnabled(False)
         
@@ -147,8 +174,18 @@ class SecurityObserverGUI(QMainWindow):
         self.status_label = QLabel("Ready to scan")
         self.status_label.setStyleSheet("color: #90e0ef;")
         
+        # Scan queue: one row per host with its latest status
+        self.queue_table = QTableWidget(0, 2)
+        self.queue_table.setHorizontalHeaderLabels(["Host", "Status"])
+        self.queue_table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.queue_table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.queue_table.verticalHeader().setVisible(False)
+        self.queue_table.horizontalHeader().setStretchLastSection(True)
+        self.queue_table.setMaximumHeight(120)
+        
         progress_layout.addWidget(self.progress_bar)
         progress_layout.addWidget(self.status_label)
+        progress_layout.addWidget(self.queue_table)
         
         main_layout.addWidget(progress_group)
         
@@ -159,13 +196,39 @@ class SecurityObserverGUI(QMainWindow):
         # Create splitter for results
         splitter = QSplitter(Qt.Vertical)
         
-        # Results table
-        self.results_table = QTableWidget()
-        self.results_table.setColumnCount(4)
-        self.results_table.setHorizontalHeaderLabels(["Test", "Status", "Score", "Description"])
-        self.results_table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        # Filter and load controls
+        filter_layout = QHBoxLayout()
+        self.filter_input = QLineEdit()
+        self.filter_input.setPlaceholderText("Filter by host, test, status or description")
+        self.load_results_btn = QPushButton("Load Results")
+        self.load_results_btn.clicked.connect(self.load_results_file)
+        filter_layout.addWidget(self.filter_input)
+        filter_layout.addWidget(self.load_results_btn)
+        results_layout.addLayout(filter_layout)
+        
+        # Results table backed by a model so large result sets stay responsive
+        self.results_model = ResultsModel(self)
+        self.results_proxy = ResultsFilterProxy(self)
+        self.results_proxy.setSourceModel(self.results_model)
+        
+        self.results_table = QTableView()
+        self.results_table.setModel(self.results_proxy)
+        self.results_table.setSortingEnabled(True)
+        self.results_table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.results_table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.results_table.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        self.results_table.verticalHeader().setVisible(False)
+        self.results_table.horizontalHeader().setSectionResizeMode(QHeaderView.Interactive)
+        self.results_table.horizontalHeader().setStretchLastSection(True)
         self.results_table.setVisible(False)
         
+        # Re-filter once typing pauses rather than on every keystroke
+        self.filter_timer = QTimer(self)
+        self.filter_timer.setSingleShot(True)
+        self.filter_timer.setInterval(150)
+        self.filter_timer.timeout.connect(lambda: self.results_proxy.set_filter_text(self.filter_input.text()))
+        self.filter_input.textChanged.connect(self.filter_timer.start)
+        
         # Log output
         self.log_output = QTextEdit()
         self.log_output.setMaximumHeight(150)
@@ -213,69 +276,119 @@ class SecurityObserverGUI(QMainWindow):
             self.output_file_btn.setText(f"File: {file_path.split('/')[-1]}")
             
     def start_scan(self):
-        """Start the security scan"""
-        domain = self.domain_input.text().strip()
-        if not domain:
+        """Queue every domain in the input for scanning"""
+        domains = [d for d in re.split(r"[\s,]+", self.domain_input.text().strip()) if d]
+        if not domains:
             QMessageBox.warning(self, "Input Error", "Please enter a domain to scan.")
             return
             
-        # Validate domain (basic check)
-        if not self.is_valid_domain(domain):
-            QMessageBox.warning(self, "Input Error", "Please enter a valid domain.")
+        # Normalize, validate and check the allow/block lists; repeats are simply dropped
+        rejected = []
+
+        def skipped(domain, reason):
+            if reason != "duplicate":
+                rejected.append(domain if reason == "invalid" else f"{domain} ({reason})")
+
+        domains = list(TargetPipeline().run(domains, skipped))
+        if rejected:
+            QMessageBox.warning(self, "Input Error", f"Please enter valid domains: {', '.join(rejected)}")
             return
             
-        # Disable controls
-        self.scan_button.setEnabled(False)
+        # Clear previous results when starting a fresh queue
+        if not self.tasks:
+            self.results_model.clear()
+            self.results_table.setVisible(False)
+            self.summary_label.setVisible(False)
+            self.log_output.clear()
+            self.queue_table.setRowCount(0)
+            self.queue_rows = {}
+            self.finished_count = 0
+            self.scanned_hosts = 0
+            self.totals = [0, 0, 0, 0]
+            
+        output_file = self.output_file_path if self.save_output_checkbox.isChecked() else None
+        for domain in domains:
+            if domain in self.tasks:
+                continue
+            task = ScanTask(domain, verbose=self.verbose_checkbox.isChecked(), output_file=output_file)
+            task.signals.progress_updated.connect(self.update_progress)
+            task.signals.scan_completed.connect(self.scan_completed)
+            task.signals.scan_error.connect(self.scan_error)
+            task.signals.scan_cancelled.connect(self.scan_cancelled)
+            self.tasks[domain] = task
+            self.set_queue_status(domain, "Queued")
+            self.pool.start(task)
+            
+        self.domain_input.clear()
         self.stop_button.setEnabled(True)
         self.progress_bar.setVisible(True)
-        self.progress_bar.setRange(0, 0)  # Indeterminate progress
-        
-        # Clear previous results
-        self.results_table.setVisible(False)
-        self.summary_label.setVisible(False)
-        self.log_output.clear()
-        
-        # Start scan worker
-        self.scan_worker = ScanWorker(
-            domain,
-            verbose=self.verbose_checkbox.isChecked(),
-            output_file=self.output_file_path if self.save_output_checkbox.isChecked() else None
-        )
-        
-        self.scan_worker.progress_updated.connect(self.update_progress)
-        self.scan_worker.scan_completed.connect(self.scan_completed)
-        self.scan_worker.scan_error.connect(self.scan_error)
-        
-        self.scan_worker.start()
+        self.update_progress_bar()
+        self.progress_timer.start()
         
     def stop_scan(self):
-        """Stop the current scan"""
-        if self.scan_worker and self.scan_worker.isRunning():
-            self.scan_worker.terminate()
-            self.scan_worker.wait()
-            
-        self.reset_ui()
+        """Ask every queued and running scan to stop at its next checkpoint"""
+        for task in self.tasks.values():
+            task.cancel.set()
+        self.stop_button.setEnabled(False)
+        self.status_label.setText(f"Stopping {len(self.tasks)} scans...")
         self.log_output.append("Scan stopped by user.")
         
-    def update_progress(self, message):
-        """Update progress message"""
-        self.status_label.setText(message)
-        self.log_output.append(message)
-        
-    def scan_completed(self, results, elapsed_time):
+    def update_progress(self, host, message):
+        """Record the latest progress message; the UI catches up in flush_progress"""
+        self.pending_status[host] = message
+        
+    def flush_progress(self):
+        """Apply coalesced progress messages, logging only changes of status"""
+        pending, self.pending_status = self.pending_status, {}
+        for host, message in pending.items():
+            if self.set_queue_status(host, message):
+                self.log_output.append(f"{host}: {message}")
+        if pending:
+            self.status_label.setText(f"{host}: {message}")
+            
+    def set_queue_status(self, host, status):
+        """Show status in host's queue row, returning True if it changed"""
+        row = self.queue_rows.get(host)
+        if row is None:
+            row = self.queue_rows[host] = self.queue_table.rowCount()
+            self.queue_table.insertRow(row)
+            self.queue_table.setItem(row, 0, QTableWidgetItem(host))
+            self.queue_table.setItem(row, 1, QTableWidgetItem(status))
+            return True
+        item = self.queue_table.item(row, 1)
+        if item.text() == status:
+            return False
+        item.setText(status)
+        return True
+        
+    def update_progress_bar(self):
+        self.progress_bar.setRange(0, self.finished_count + len(self.tasks))
+        self.progress_bar.setValue(self.finished_count)
+        
+    def finish_task(self, host, status):
+        """Drop a finished task from the queue and reset the UI once it is empty"""
+        self.tasks.pop(host, None)
+        self.pending_status.pop(host, None)
+        self.set_queue_status(host, status)
+        self.finished_count += 1
+        self.update_progress_bar()
+        if not self.tasks:
+            self.reset_ui()
+            
+    def scan_completed(self, host, results, elapsed_time):
         """Handle scan completion"""
-        self.reset_ui()
+        self.finish_task(host, f"Completed in {elapsed_time:.1f}s")
         
         # Display results in table
-        self.display_results(results)
+        records = normalize_results(results)
+        self.display_results(host, records)
         
-        # Show summary
-        total_tests = len(results)
-        passed_tests = sum(1 for test in results.values() if test['pass'] is True)
-        failed_tests = sum(1 for test in results.values() if test['pass'] is False)
-        info_tests = total_tests - passed_tests - failed_tests
+        # Show summary across every host scanned from this queue
+        self.scanned_hosts += 1
+        self.totals = [a + b for a, b in zip(self.totals, summarize(records))]
+        total_tests, passed_tests, failed_tests, info_tests = self.totals
         
-        summary = f"Scan completed in {elapsed_time:.1f}s | "
+        summary = f"Scanned {self.scanned_hosts} hosts | "
         summary += f"Total: {total_tests} | "
         summary += f"Passed: {passed_tests} | "
         summary += f"Failed: {failed_tests} | "
@@ -284,72 +397,77 @@ class SecurityObserverGUI(QMainWindow):
         self.summary_label.setText(summary)
         self.summary_label.setVisible(True)
         
-        self.log_output.append(f"Scan completed successfully in {elapsed_time:.1f} seconds.")
+        self.log_output.append(f"{host}: scan completed successfully in {elapsed_time:.1f} seconds.")
         
-    def scan_error(self, error_message):
+    def scan_error(self, host, error_message):
         """Handle scan errors"""
-        self.reset_ui()
-        self.log_output.append(f"Error: {error_message}")
-        QMessageBox.critical(self, "Scan Error", f"An error occurred during the scan:\n{error_message}")
+        self.finish_task(host, "Error")
+        self.log_output.append(f"{host}: Error: {error_message}")
+        
+    def scan_cancelled(self, host):
+        self.finish_task(host, "Cancelled")
         
     def reset_ui(self):
         """Reset UI to initial state"""
+        self.progress_timer.stop()
+        self.flush_progress()
         self.scan_button.setEnabled(True)
         self.stop_button.setEnabled(False)
         self.progress_bar.setVisible(False)
         self.status_label.setText("Ready to scan")
         
-    def display_results(self, results):
-        """Display scan results in the table"""
-        self.results_table.setRowCount(len(results))
+    def closeEvent(self, event):
+        """Cancel outstanding scans and let their threads exit before closing"""
+        for task in self.tasks.values():
+            task.cancel.set()
+        self.pool.waitForDone()
+        super().closeEvent(event)
         
-        for row, (key, test_data) in enumerate(results.items()):
-            # Test name
-            name_item = QTableWidgetItem(test_data['name'])
-            name_item.setFlags(name_item.flags() & ~Qt.ItemIsEditable)
-            self.results_table.setItem(row, 0, name_item)
-            
-            # Status
-            if test_data['pass'] is True:
-                status = "✅ PASS"
-                color = "#90EE90"  # Light green
-            elif test_data['pass'] is False:
-                status = "❌ FAIL"
-                color = "#FFB6C1"  # Light red
-            else:
-                status = "⚠️  INFO"
-                color = "#FFE4B5"  # Light orange
-                
-            status_item = QTableWidgetItem(status)
-            status_item.setFlags(status_item.flags() & ~Qt.ItemIsEditable)
-            status_item.setBackground(QColor(color))
-            self.results_table.setItem(row, 1, status_item)
-            
-            # Score
-            score = f"{test_data['score_modifier']:+d}" if test_data['score_modifier'] != 0 else "0"
-            score_item = QTableWidgetItem(score)
-            score_item.setFlags(score_item.flags() & ~Qt.ItemIsEditable)
-            self.results_table.setItem(row, 2, score_item)
+    def display_results(self, host, records):
+        """Add one host's normalized scan results to the table"""
+        self.results_model.add_results(host, records)
+        self.results_table.setVisible(True)
+        
+    def load_results_file(self):
+        """Load host records written by the CLI with --format json or ndjson"""
+        file_path, _ = QFileDialog.getOpenFileName(
+            self, "Load Scan Results", "", "JSON Results (*.json *.ndjson *.jsonl);;All Files (*)"
+        )
+        if not file_path:
+            return
             
-            # Description
-            description = test_data['score_description']
-            if description:
-                import re
-                description = re.sub(r'<[^>]+>', '', description)
-                description = description.replace('\n', ' ').strip()
-                description = description[:80] + "..." if len(description) > 80 else description
-                
-            desc_item = QTableWidgetItem(description)
-            desc_item.setFlags(desc_item.flags() & ~Qt.ItemIsEditable)
-            self.results_table.setItem(row, 3, desc_item)
+        try:
+            with open(file_path, "r") as handle:
+                if handle.read(1) == "[":
+                    handle.seek(0)
+                    entries = json.load(handle)
+                else:
+                    handle.seek(0)
+                    entries = (json.loads(line) for line in handle if line.strip())
+                    
+                self.results_model.clear()
+                totals = [0, 0, 0, 0]
+                hosts = 0
+                for entry in entries:
+                    if not entry.get("tests"):
+                        continue
+                    records = normalize_results(entry["tests"])
+                    self.display_results(entry["host"], records)
+                    totals = [a + b for a, b in zip(totals, summarize(records))]
+                    hosts += 1
+        except (OSError, ValueError, KeyError) as e:
+            QMessageBox.critical(self, "Load Error", f"Could not load results:\n{e}")
+            return
             
-        self.results_table.setVisible(True)
+        self.summary_label.setText(
+            f"Loaded {hosts} hosts | Total: {totals[0]} | Passed: {totals[1]} | Failed: {totals[2]} | Info: {totals[3]}"
+        )
+        self.summary_label.setVisible(True)
+        self.log_output.append(f"Loaded results for {hosts} hosts from {file_path}.")
         
     def is_valid_domain(self, domain):
         """Basic domain validation"""
-        import re
-        pattern = r'^[a-zA-Z0-9]([a-zA-Z0-9\-]{0,61}[a-zA-Z0-9])?(\.[a-zA-Z0-9]([a-zA-Z0-9\-]{0,61}[a-zA-Z0-9])?)*$'
-        return bool(re.match(pattern, domain))
+        return is_valid_domain(domain)
 
 
 def main():
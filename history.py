@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+
+import os
+import json
+import time
+import threading
+import config
+from cache import cache_key
+
+
+_history = None
+_lock = threading.Lock()
+
+
+def compact_tests(payload):
+    """Reduce a getScanResults payload to {test: [pass, score_modifier]}"""
+    return {
+        key: [test['pass'] if test['pass'] is None else bool(test['pass']), test['score_modifier']]
+        for key, test in payload.items()
+    }
+
+
+def diff_tests(previous, payload):
+    """Tests whose pass or score_modifier changed between a stored scan and a new payload"""
+    current = compact_tests(payload)
+    changes = []
+    for key in sorted(previous.keys() | current.keys()):
+        before = previous.get(key)
+        after = current.get(key)
+        if before == after:
+            continue
+        changes.append({
+            'test': key,
+            'name': payload[key]['name'] if key in payload else key,
+            'change': 'added' if before is None else 'removed' if after is None else 'changed',
+            'pass_before': before[0] if before else None,
+            'pass': after[0] if after else None,
+            'score_before': before[1] if before else None,
+            'score_modifier': after[1] if after else None,
+        })
+    return changes
+
+
+class HistoryStore:
+    """Append-only SQLite log of every scan's test outcomes, indexed by host and time"""
+
+    def __init__(self, path=None):
+        self.path = os.path.expanduser(path or config.HISTORY_PATH)
+        self.lock = threading.Lock()
+
+        import sqlite3
+        if self.path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self.conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS scans ('
+            ' host TEXT NOT NULL,'
+            ' scanned_at REAL NOT NULL,'
+            ' scan_id INTEGER,'
+            ' tests TEXT NOT NULL)'
+        )
+        self.conn.execute('CREATE INDEX IF NOT EXISTS scans_host_time ON scans (host, scanned_at)')
+
+    def latest(self, host, exclude_scan_id=None):
+        """Return (scan_id, scanned_at, tests) for the newest stored scan of host"""
+        with self.lock:
+            row = self.conn.execute(
+                'SELECT scan_id, scanned_at, tests FROM scans WHERE host = ? AND scan_id IS NOT ?'
+                ' ORDER BY scanned_at DESC LIMIT 1',
+                (cache_key(host), exclude_scan_id),
+            ).fetchone()
+        if row is None:
+            return None
+        return row[0], row[1], json.loads(row[2])
+
+    def record(self, host, scan_id, payload):
+        """Append a scan unless it is already stored; return the scan before it, if any"""
+        key = cache_key(host)
+        with self.lock:
+            last = self.conn.execute(
+                'SELECT scan_id FROM scans WHERE host = ? ORDER BY scanned_at DESC LIMIT 1', (key,)
+            ).fetchone()
+            # Cache hits hand back a scan we already logged
+            if last is None or scan_id is None or last[0] != scan_id:
+                self.conn.execute(
+                    'INSERT INTO scans (host, scanned_at, scan_id, tests) VALUES (?, ?, ?, ?)',
+                    (key, time.time(), scan_id, json.dumps(compact_tests(payload), separators=(',', ':'))),
+                )
+        return self.latest(host, exclude_scan_id=scan_id)
+
+    def scans(self, host, limit=None):
+        """Return (scan_id, scanned_at, tests) for host, newest first"""
+        with self.lock:
+            rows = self.conn.execute(
+                'SELECT scan_id, scanned_at, tests FROM scans WHERE host = ? ORDER BY scanned_at DESC LIMIT ?',
+                (cache_key(host), -1 if limit is None else limit),
+            ).fetchall()
+        return [(scan_id, scanned_at, json.loads(tests)) for scan_id, scanned_at, tests in rows]
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+def get_history():
+    """Return the history store shared by this process"""
+    global _history
+    if _history is None:
+        with _lock:
+            if _history is None:
+                _history = HistoryStore()
+    return _history
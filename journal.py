@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+
+import os
+import threading
+from cache import cache_key
+from targets import SeenHosts
+
+
+# One tab-separated line per event: code, host, scan_id (or error text)
+SUBMITTED = 'S'
+FINISHED = 'F'
+FAILED = 'E'
+
+
+def load_journal(path):
+    """Return (finished hosts as SeenHosts, {host: scan_id} still in flight, number finished)"""
+    # Finished hosts spill to SQLite like target dedup; only unfinished submissions stay in the dict
+    finished = SeenHosts()
+    resume = {}
+    count = 0
+    if not os.path.exists(path):
+        return finished, resume, count
+    with open(path, 'r') as handle:
+        for line in handle:
+            fields = line.rstrip('\n').split('\t')
+            # A line cut short by a crash is simply ignored
+            if not line.endswith('\n') or len(fields) != 3 or fields[0] not in (SUBMITTED, FINISHED, FAILED):
+                continue
+            event, host, value = fields
+            if event == FINISHED:
+                count += finished.add(host)
+                resume.pop(host, None)
+            elif event == SUBMITTED and value.isdigit():
+                resume[host] = int(value)
+            else:
+                resume.pop(host, None)
+    return finished, resume, count
+
+
+class Journal:
+    """Append-only checkpoint log of each host's progress through a batch"""
+
+    def __init__(self, path, resume=False):
+        self.path = path
+        self.lock = threading.Lock()
+        self.handle = open(path, 'a' if resume else 'w')
+
+    def write(self, event, host, value):
+        line = f"{event}\t{cache_key(host)}\t{str(value or '').replace(chr(9), ' ').replace(chr(10), ' ')}\n"
+        with self.lock:
+            self.handle.write(line)
+            # Flushed per line so a killed process loses at most the current one
+            self.handle.flush()
+
+    def submitted(self, host, scan_id):
+        self.write(SUBMITTED, host, scan_id)
+
+    def finished(self, host, scan_id):
+        self.write(FINISHED, host, scan_id)
+
+    def failed(self, host, error):
+        self.write(FAILED, host, error)
+
+    def close(self):
+        with self.lock:
+            self.handle.close()
@@ -0,0 +1,143 @@
+#!/usr/bin/env python
+
+import sys
+import json
+import queue
+import atexit
+import logging
+import threading
+from colorama import Fore, Style
+import config
+
+
+LOGGER_NAME = 'observer'
+
+# Structured fields a record may carry, in the order they are written
+FIELDS = ('host', 'scan_id', 'state')
+
+# Utils.msg level names -> (logging level, console prefix)
+STYLES = {
+    'error': (logging.ERROR, f'{Fore.RED}[!]{Style.RESET_ALL} '),
+    'warn': (logging.WARNING, f'{Fore.YELLOW}[!]{Style.RESET_ALL} '),
+    'info': (logging.INFO, f'{Fore.BLUE}[*]{Style.RESET_ALL} '),
+    'success': (logging.INFO, f'{Fore.GREEN}[$]{Style.RESET_ALL} '),
+    'debug': (logging.DEBUG, f'{Fore.WHITE}[-]{Style.RESET_ALL} '),
+}
+
+_listener = None
+_embedded = False
+_lock = threading.Lock()
+
+
+def style_of(level):
+    """Map a Utils.msg level such as 'warn' or 'error' to a style name"""
+    for style in ('error', 'warn', 'info', 'success', 'title', 'debug'):
+        if style in level:
+            return style
+    return None
+
+
+def format_console(text, style):
+    if style == 'title':
+        return f'{Fore.CYAN}{text}{Style.RESET_ALL}'
+    prefix = STYLES[style][1] if style in STYLES else ''
+    return f'{prefix}{text}'
+
+
+class ConsoleFormatter(logging.Formatter):
+    """The colored '[*] text' lines Utils.msg has always printed"""
+
+    def format(self, record):
+        return format_console(record.getMessage(), getattr(record, 'style', None))
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line with the record's structured fields"""
+
+    def format(self, record):
+        entry = {
+            'time': round(record.created, 3),
+            'level': record.levelname,
+            'thread': record.threadName,
+            'message': record.getMessage(),
+        }
+        for field in FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+def setup_logging(level=None, log_file=None, stream=None):
+    """Route the 'observer' logger through a queue to console and file handlers on one thread"""
+    with _lock:
+        return start_listener(level, log_file, stream)
+
+
+def start_listener(level=None, log_file=None, stream=None):
+    from logging.handlers import QueueHandler, QueueListener
+
+    global _listener, _embedded
+    if _listener is not None:
+        _listener.stop()
+    _embedded = False
+
+    console = logging.StreamHandler(stream or sys.stdout)
+    console.setFormatter(ConsoleFormatter())
+    handlers = [console]
+    log_file = config.LOG_FILE if log_file is None else log_file
+    if log_file:
+        file_handler = logging.FileHandler(log_file)
+        file_handler.setFormatter(JsonFormatter())
+        handlers.append(file_handler)
+
+    # Callers only enqueue; the listener thread does all terminal and file I/O
+    records = queue.SimpleQueue()
+    logger = logging.getLogger(LOGGER_NAME)
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+    logger.addHandler(QueueHandler(records))
+    logger.setLevel(level or config.LOG_LEVEL)
+    logger.propagate = False
+
+    _listener = QueueListener(records, *handlers, respect_handler_level=True)
+    _listener.start()
+    return logger
+
+
+def stop_logging():
+    """Flush queued records and stop the listener thread"""
+    global _listener
+    with _lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+
+
+def use_host_logging():
+    """When embedded as a library, hand 'observer' records to the application's logging instead of printing them"""
+    global _embedded
+    with _lock:
+        if _listener is None:
+            logging.getLogger(LOGGER_NAME).propagate = True
+            _embedded = True
+
+
+def get_logger():
+    """Return the 'observer' logger, setting up the default pipeline on first use"""
+    if _listener is None and not _embedded:
+        with _lock:
+            if _listener is None and not _embedded:
+                start_listener()
+    return logging.getLogger(LOGGER_NAME)
+
+
+def log_message(text, style=None, **fields):
+    """Enqueue one styled message with its structured fields"""
+    severity = STYLES[style][0] if style in STYLES else logging.INFO
+    get_logger().log(severity, text, extra={'style': style, **fields})
+
+
+atexit.register(stop_logging)
@@ -2,20 +2,298 @@
 
 import sys
 import argparse
-from utils import Utils
-from scanner import Scanner
+from writers import FORMATS, RECORDS
+import config
+
+# Everything else is imported where it is first needed, so cache hits and
+# argument errors from cron/CI never pay for requests, rich or aiohttp
 
 def validate_domain(domain):
-    """Validate domain format"""
-    import re
-    # Basic domain validation
-    pattern = r'^[a-zA-Z0-9]([a-zA-Z0-9\-]{0,61}[a-zA-Z0-9])?(\.[a-zA-Z0-9]([a-zA-Z0-9\-]{0,61}[a-zA-Z0-9])?)*$'
-    if not re.match(pattern, domain):
+    """Validate domain format and the allow/block lists, returning the normalized host"""
+    from targets import get_target_filter, is_valid_domain, normalize_host
+
+    host = normalize_host(domain)
+    if not host or not is_valid_domain(host):
         raise argparse.ArgumentTypeError(f"Invalid domain format: {domain}")
-    return domain
+    reason = get_target_filter().check(host)
+    if reason is not None:
+        raise argparse.ArgumentTypeError(f"Domain {reason} by configuration: {domain}")
+    return host
+
+def shard_spec(text):
+    """Parse a --shard value of the form i/N"""
+    try:
+        index, count = (int(part) for part in text.split("/"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Invalid shard {text!r}; expected i/N such as 1/4")
+    if not 1 <= index <= count:
+        raise argparse.ArgumentTypeError(f"Invalid shard {text!r}; i must be between 1 and N")
+    return index, count
+
+def write_result(options, writer, target, scan):
+    """Append a finished scan to the history and write it, or only its changes with --diff"""
+    previous = None
+    if options.use_history:
+        from history import get_history
+
+        previous = get_history().record(target, scan.scan_id, scan.scan_result)
+        # A cache hit hands back a scan that is already archived
+        if scan.cached_at is None:
+            from archive import get_archive
+
+            get_archive().record(target, scan.scan_result)
+    if options.diff:
+        from history import diff_tests
+
+        changes = diff_tests(previous[2], scan.scan_result) if previous else []
+        writer.write_diff(target, scan, previous, changes)
+    else:
+        writer.write(target, scan)
+
+def main_batch(options, utils, writer):
+    """Scan every domain in options.targets_file on a worker pool"""
+    from batch import BatchRunner, read_targets
+    from targets import TargetPipeline
+
+    def skipped(target, reason):
+        # Duplicates and policy hits in a long list are expected; only typos are worth a warning
+        utils.msg(f"Skipping {reason} domain: {target}", "warn" if reason == "invalid" else "debug")
 
-def main_cli(cli_args=None):
     import time
+
+    # Targets stream from the file into the runner, so memory does not grow with the list
+    pipeline = TargetPipeline(shard=options.shard)
+    targets = pipeline.run(read_targets(options.targets_file), skipped)
+    shard = None
+    if options.shard is not None:
+        shard = {
+            "index": options.shard[0],
+            "count": options.shard[1],
+            "hash": "jump-blake2b",
+            "targets_file": options.targets_file,
+            "started_at": round(time.time(), 3),
+        }
+        writer.write_meta(shard)
+    journal = None
+    finished = None
+    resume = {}
+    if options.journal is not None:
+        from journal import Journal, load_journal
+
+        if options.resume:
+            finished, resume, count = load_journal(options.journal)
+            # add() is True only for hosts the journal has not seen finish
+            targets = (target for target in targets if finished.add(target))
+            utils.msg(f"Resuming: {count} hosts already finished, {len(resume)} scans in flight", "info")
+        journal = Journal(options.journal, resume=options.resume)
+    utils.msg(f"Checking domains from {options.targets_file} with {options.concurrency} workers", "info")
+
+    done = 0
+    failed = 0
+
+    def report(target, scan, err):
+        nonlocal done, failed
+        done += 1
+        if err is not None:
+            failed += 1
+            if journal is not None:
+                journal.failed(target, err)
+            writer.write_error(target, err)
+            return
+        write_result(options, writer, target, scan)
+        if journal is not None:
+            journal.finished(target, scan.scan_id)
+
+    try:
+        if options.engine == "async":
+            import asyncio
+            from async_scanner import AsyncBatchRunner
+
+            async def run_async():
+                runner = AsyncBatchRunner(options, targets, options.concurrency, journal, resume)
+                async for result in runner.run():
+                    report(*result)
+
+            asyncio.run(run_async())
+        else:
+            runner = BatchRunner(options, targets, options.concurrency, journal, resume)
+            for result in runner.run():
+                report(*result)
+    finally:
+        if journal is not None:
+            journal.close()
+        if finished is not None:
+            finished.close()
+
+    utils.msg(pipeline.summary(), "info")
+    if shard is not None:
+        writer.write_meta(dict(shard, hosts=pipeline.counts["accepted"], finished_at=round(time.time(), 3)))
+    utils.msg(f"Finished {done} scans ({failed} failed)", "success" if not failed else "warn")
+
+def main_daemon(options, utils, writer):
+    """Keep every host in options.targets_file fresh until interrupted"""
+    from daemon import FleetDaemon, serve_results
+
+    def valid(host):
+        try:
+            validate_domain(host)
+            return True
+        except argparse.ArgumentTypeError as err:
+            utils.msg(f"Skipping {err}", "warn")
+            return False
+
+    daemon = FleetDaemon(options, options.targets_file, options.max_age, options.concurrency, validate=valid, spill=options.spill)
+    daemon.on_result = lambda target, scan: write_result(options, writer, target, scan)
+    server = None
+    if options.listen:
+        server = serve_results(daemon, options.listen)
+        utils.msg(f"Serving latest results on http://{options.listen}/hosts", "info")
+    daemon.handle_signals()
+    try:
+        daemon.run()
+    finally:
+        if server is not None:
+            server.shutdown()
+    utils.msg("Daemon stopped", "info")
+
+def main_stats(cli_args):
+    """Fleet-wide aggregates over the columnar result archive"""
+    parser = argparse.ArgumentParser(
+        prog="main.py --cli stats",
+        description="HTTP Security Observer - fleet statistics from the result archive",
+    )
+    parser.add_argument(
+        "--archive",
+        default=config.ARCHIVE_PATH,
+        dest="archive",
+        help=f"Archive directory to read (default: {config.ARCHIVE_PATH})",
+    )
+    parser.add_argument(
+        "--top",
+        type=int,
+        default=10,
+        dest="top",
+        help="Number of lowest-scoring hosts to list (default: 10)",
+    )
+    parser.add_argument(
+        "--days",
+        type=int,
+        default=30,
+        dest="days",
+        help="Days of daily failure-rate trend to show (default: 30)",
+    )
+    parser.add_argument(
+        "--json",
+        action="store_true",
+        dest="json",
+        default=False,
+        help="Print the report as JSON",
+    )
+    options = parser.parse_args(cli_args)
+
+    from archive import ArchiveStats
+    from utils import Utils
+
+    utils = Utils()
+    try:
+        report = ArchiveStats(options.archive).report(options.top, options.days)
+    except RuntimeError as err:
+        utils.msg(err, "error")
+        exit(1)
+    if options.json:
+        import json
+
+        print(json.dumps(report, indent=2))
+    else:
+        utils.print_stats(report)
+
+def main_merge(cli_args):
+    """Combine --shard partial result sets into one, keeping each host's newest result"""
+    parser = argparse.ArgumentParser(
+        prog="main.py --cli merge",
+        description="HTTP Security Observer - merge --shard result files",
+    )
+    parser.add_argument("files", nargs="+", help="json or ndjson result files written with --shard")
+    parser.add_argument(
+        "-o",
+        "--out",
+        default=None,
+        dest="write",
+        help="File to which to write the merged results",
+    )
+    parser.add_argument(
+        "--format",
+        choices=FORMATS,
+        default="ndjson",
+        dest="format",
+        help="Output format of the merged results (default: ndjson)",
+    )
+    parser.add_argument(
+        "--records",
+        choices=RECORDS,
+        default="host",
+        dest="records",
+        help="Emit one json/ndjson/csv record per host or per test (default: host)",
+    )
+    options = parser.parse_args(cli_args)
+
+    from log import setup_logging
+    from utils import Utils
+    from writers import make_writer
+    from shard import StoredScan, merge_results
+
+    setup_logging(config.LOG_LEVEL, None, sys.stderr if options.format != "table" and options.write is None else sys.stdout)
+    utils = Utils()
+    try:
+        shards, hosts = merge_results(options.files)
+    except (OSError, ValueError) as err:
+        utils.msg(f"Cannot merge: {err}", "error")
+        exit(1)
+
+    counts = set()
+    indexes = set()
+    for path, meta in shards.items():
+        if "index" not in meta:
+            utils.msg(f"{path}: {meta['records']} records without shard metadata", "warn")
+            continue
+        counts.add(meta["count"])
+        indexes.add(meta["index"])
+        if "finished_at" not in meta:
+            utils.msg(f"{path}: shard {meta['index']}/{meta['count']} did not finish; {meta['records']} hosts written", "warn")
+            continue
+        complete = "" if meta["records"] >= meta["hosts"] else f" ({meta['hosts'] - meta['records']} hosts missing)"
+        utils.msg(f"{path}: shard {meta['index']}/{meta['count']}, {meta['records']} of {meta['hosts']} hosts{complete}", "info" if not complete else "warn")
+    if len(counts) > 1:
+        utils.msg(f"Shard files come from runs split {len(counts)} different ways: {sorted(counts)}", "warn")
+    elif counts:
+        missing = sorted(set(range(1, max(counts) + 1)) - indexes)
+        if missing:
+            utils.msg(f"No file for shards {', '.join(map(str, missing))} of {max(counts)}", "warn")
+
+    out = sys.stdout if options.write is None else open(options.write, "w", newline="")
+    writer = make_writer(options.format, out, options.records, titles=True)
+    try:
+        writer.write_meta({
+            "merged": sorted(f"{meta['index']}/{meta['count']}" for meta in shards.values() if "index" in meta),
+            "hosts": len(hosts),
+        })
+        for host in sorted(hosts):
+            record = hosts[host]
+            if "error" in record:
+                writer.write_error(host, record["error"])
+            else:
+                writer.write(host, StoredScan(record))
+    finally:
+        writer.close()
+        if out is not sys.stdout:
+            out.close()
+    utils.msg(f"Merged {len(hosts)} hosts from {len(options.files)} files", "success")
+
+def main_cli(cli_args=None):
+    if cli_args and cli_args[0] == "stats":
+        return main_stats(cli_args[1:])
+    if cli_args and cli_args[0] == "merge":
+        return main_merge(cli_args[1:])
     parser = argparse.ArgumentParser(
         description="HTTP Security Observer - CLI Mode",
         epilog="Example: python3 main.py --cli -u www.example.com"
@@ -28,12 +306,114 @@ def main_cli(cli_args=None):
         default=False,
         help="Show all output",
     )
-    parser.add_argument(
+    targets = parser.add_mutually_exclusive_group(required=True)
+    targets.add_argument(
         "-u",
         "--url",
-        required=True,
         dest="target",
-        help="Domain on which to perform tests. (REQUIRED)",
+        help="Domain on which to perform tests.",
+    )
+    targets.add_argument(
+        "-f",
+        "--targets-file",
+        dest="targets_file",
+        help="File with one domain per line to scan in bulk ('-' reads stdin)",
+    )
+    parser.add_argument(
+        "-c",
+        "--concurrency",
+        type=int,
+        default=config.BATCH_CONCURRENCY,
+        dest="concurrency",
+        help=f"Number of scans to run at once with --targets-file (default: {config.BATCH_CONCURRENCY})",
+    )
+    parser.add_argument(
+        "-t",
+        "--scan-timeout",
+        type=int,
+        default=config.SCAN_TIMEOUT,
+        dest="scan_timeout",
+        help=f"Seconds to wait for each scan before reporting a timeout, 0 to wait forever (default: {config.SCAN_TIMEOUT})",
+    )
+    parser.add_argument(
+        "--max-age",
+        type=int,
+        default=None,
+        dest="max_age",
+        help=f"Reuse cached results younger than this many seconds, 0 forces a rescan (default: {config.CACHE_TTL}); with --daemon, how fresh to keep each host (default: {config.DAEMON_MAX_AGE})",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_false",
+        dest="use_cache",
+        default=True,
+        help="Neither read nor write the local result cache",
+    )
+    parser.add_argument(
+        "--no-history",
+        action="store_false",
+        dest="use_history",
+        default=True,
+        help="Do not append results to the local scan history",
+    )
+    parser.add_argument(
+        "--diff",
+        action="store_true",
+        dest="diff",
+        default=False,
+        help="Only report tests whose pass/score_modifier changed since the host's previous scan",
+    )
+    parser.add_argument(
+        "--journal",
+        default=None,
+        dest="journal",
+        help="Record each host's progress through a --targets-file batch in this checkpoint file",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        dest="resume",
+        default=False,
+        help="Continue an interrupted batch from its --journal: skip finished hosts and poll in-flight scans",
+    )
+    parser.add_argument(
+        "--spill",
+        default=None,
+        dest="spill",
+        help=f"Append each host's raw results, compressed, to this indexed file; json/ndjson output then carries only per-host summaries. With --daemon, where to keep payloads (default: {config.DAEMON_SPILL_PATH})",
+    )
+    parser.add_argument(
+        "--shard",
+        type=shard_spec,
+        default=None,
+        dest="shard",
+        help="Only scan the hosts of --targets-file that consistent hashing assigns to shard i of N, e.g. 2/4",
+    )
+    parser.add_argument(
+        "--daemon",
+        action="store_true",
+        dest="daemon",
+        default=False,
+        help="Keep rescanning the --targets-file inventory ('host [importance]' lines), oldest results first, until stopped",
+    )
+    parser.add_argument(
+        "--listen",
+        default=config.DAEMON_LISTEN,
+        dest="listen",
+        help=f"HOST:PORT where --daemon serves its latest results, empty to disable (default: {config.DAEMON_LISTEN})",
+    )
+    parser.add_argument(
+        "--engine",
+        choices=["threads", "async"],
+        default=config.BATCH_ENGINE,
+        dest="engine",
+        help="Scan engine for --targets-file: a thread pool or a single asyncio event loop",
+    )
+    parser.add_argument(
+        "--api-base",
+        default=None,
+        dest="api_base",
+        help=f"Observatory API base URL (default: {config.API_BASE_URL}); results from another base are cached apart and kept out of the history",
     )
     parser.add_argument(
         "-o",
@@ -42,37 +422,123 @@ def main_cli(cli_args=None):
         dest="write",
         help="File to which to write the program's output",
     )
+    parser.add_argument(
+        "--log-file",
+        default=config.LOG_FILE,
+        dest="log_file",
+        help="Also write JSON-lines logs with host, scan_id and state fields to this file",
+    )
+    parser.add_argument(
+        "--metrics-file",
+        default=config.METRICS_FILE,
+        dest="metrics_file",
+        help="Write per-phase scan timings as a Prometheus text file, or JSON if the name ends in .json",
+    )
+    parser.add_argument(
+        "--format",
+        choices=FORMATS,
+        default=config.DEFAULT_OUTPUT_FORMAT,
+        dest="format",
+        help=f"Output format, streamed as each scan completes (default: {config.DEFAULT_OUTPUT_FORMAT})",
+    )
+    parser.add_argument(
+        "--records",
+        choices=RECORDS,
+        default="host",
+        dest="records",
+        help="Emit one json/ndjson/csv record per host or per test (default: host)",
+    )
     if cli_args is not None:
         options = parser.parse_args(cli_args)
     else:
         options = parser.parse_args()
+    if options.daemon and options.targets_file in (None, "-"):
+        parser.error("--daemon needs an inventory file given with -f")
+    if options.shard is not None and (options.targets_file is None or options.daemon):
+        parser.error("--shard splits a --targets-file batch; it cannot be used with -u or --daemon")
+    if options.spill is not None and not options.daemon and (options.targets_file is None or options.format not in ("json", "ndjson") or options.records != "host" or options.diff):
+        parser.error("--spill needs a --targets-file batch with --format json or ndjson, --records host and no --diff")
+    if options.spill is not None and options.shard is not None:
+        # merge needs each host's tests inline, and spill offsets only mean something in their own file
+        parser.error("--spill cannot be used with --shard; merge needs the tests inline in each shard's output")
+    if options.resume and options.journal is None:
+        parser.error("--resume needs the --journal of the interrupted run")
+    if options.resume and options.write is not None and options.format == "json":
+        parser.error("--resume appends to -o, which a json array cannot take; use --format ndjson")
+    if options.api_base not in (None, config.API_BASE_URL):
+        # History and the archive describe the real Observatory, not a mock or staging API
+        if options.diff:
+            parser.error("--diff compares against the scan history, which --api-base results are kept out of")
+        options.use_history = False
+    if options.diff and not options.use_history:
+        parser.error("--diff needs the scan history; drop --no-history")
+    if options.target is not None:
+        try:
+            options.target = validate_domain(options.target)
+        except argparse.ArgumentTypeError as err:
+            parser.error(str(err))
+
+    from utils import Utils
+    from writers import make_writer
 
+    from log import setup_logging
+
+    # Keep stdout clean for a machine-readable stream
+    setup_logging(
+        "DEBUG" if options.verbosity else config.LOG_LEVEL,
+        options.log_file,
+        sys.stderr if options.format != "table" and options.write is None else sys.stdout,
+    )
     utils = Utils()
     utils.msg("HTTP Security Observer by z3r0POINTz3r0", "title")
     try:
+        out = sys.stdout
         if options.write is not None:
             try:
-                sys.stdout = open(options.write, "a")
+                out = open(options.write, "a" if options.format == "table" or options.resume else "w", newline="")
             except IOError as e:
                 utils.msg(f"Error opening output file: {e}", "error")
                 exit(1)
 
-        utils.msg(f"Checking {options.target}", "info")
-        scan = Scanner(options)
-        scan.begin()
+        spill = None
+        if options.spill is not None and not options.daemon:
+            from spill import PayloadSpill
 
-        with utils.console.status("[bold green]Awaiting results...") as status:
-            while scan.running:
-                scan.check_results()
-                time.sleep(5)
+            spill = PayloadSpill(options.spill, resume=options.resume, in_memory=False)
+        writer = make_writer(options.format, out, options.records, titles=options.targets_file is not None, diff=options.diff, spill=spill, resume=options.resume)
+        try:
+            if options.daemon:
+                main_daemon(options, utils, writer)
+            elif options.targets_file is not None:
+                main_batch(options, utils, writer)
+            else:
+                from scanner import Scanner
 
-        if options.write is not None:
-            try:
-                sys.stdout.close()
-            except IOError as e:
-                utils.msg(f"Error closing output file: {e}", "error")
+                utils.msg(f"Checking {options.target}", "info")
+                scan = Scanner(options)
+                scan.begin()
+
+                if scan.running:
+                    with utils.console.status("[bold green]Awaiting results...") as status:
+                        scan.wait()
+
+                write_result(options, writer, options.target, scan)
+        finally:
+            writer.close()
+            if spill is not None:
+                spill.close()
+            if options.metrics_file:
+                from metrics import get_metrics
 
-        utils.print_result(scan.scan_result, scan.end - scan.start)
+                try:
+                    get_metrics().write(options.metrics_file)
+                except OSError as e:
+                    utils.msg(f"Error writing metrics file: {e}", "error")
+            if out is not sys.stdout:
+                try:
+                    out.close()
+                except IOError as e:
+                    utils.msg(f"Error closing output file: {e}", "error")
     except KeyboardInterrupt:
         utils.msg("Caught Ctrl+c. Exiting!", "info")
     except Exception as err:
@@ -0,0 +1,226 @@
+#!/usr/bin/env python
+
+import os
+import json
+import time
+import bisect
+import threading
+import config
+
+
+_metrics = None
+_lock = threading.Lock()
+
+PREFIX = 'observer_'
+
+HELP = {
+    'api_call_seconds': 'Latency of one API request attempt, by call',
+    'api_retries_total': 'API attempts retried, by reason',
+    'ratelimit_wait_seconds': 'Time spent waiting for a rate limiter token, by budget',
+    'scan_state_seconds': 'Time a scan spent in each Observatory state',
+    'scan_cooldown_seconds': 'Time a scan spent parked in an API cooldown',
+    'scan_polls': 'Status checks needed per scan',
+    'scan_duration_seconds': 'Wall time from Scanner creation to results',
+    'scans_total': 'Scans completed, by result source',
+}
+
+# Per-scan poll counts need their own buckets; everything else is seconds
+POLL_BUCKETS = (1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+
+
+class Counter:
+    """Monotonically increasing count"""
+
+    kind = 'counter'
+
+    def __init__(self):
+        self.value = 0
+        self.lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self.lock:
+            self.value += amount
+
+    def snapshot(self):
+        return {'value': self.value}
+
+
+class Histogram:
+    """Bucketed distribution of observed values, exported Prometheus style"""
+
+    kind = 'histogram'
+
+    def __init__(self, buckets=None):
+        self.buckets = tuple(sorted(buckets or config.METRICS_BUCKETS))
+        # One slot per upper bound plus +Inf; made cumulative on export
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.sum += value
+
+    def cumulative(self):
+        total = 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            total += count
+            yield bound, total
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'count': self.count,
+                'sum': round(self.sum, 6),
+                'buckets': {('+Inf' if bound == float('inf') else bound): count for bound, count in self.cumulative()},
+            }
+
+
+class MetricsRegistry:
+    """Named, labelled counters and histograms shared by every scanner"""
+
+    def __init__(self):
+        self.metrics = {}
+        self.lock = threading.Lock()
+
+    def get(self, cls, name, labels, buckets=None):
+        key = (name, tuple(sorted(labels.items())))
+        metric = self.metrics.get(key)
+        if metric is None:
+            with self.lock:
+                metric = self.metrics.get(key)
+                if metric is None:
+                    metric = self.metrics[key] = cls(buckets) if cls is Histogram else cls()
+        return metric
+
+    def inc(self, name, amount=1, **labels):
+        self.get(Counter, name, labels).inc(amount)
+
+    def observe(self, name, value, buckets=None, **labels):
+        self.get(Histogram, name, labels, buckets).observe(value)
+
+    def collect(self):
+        """Yield (name, labels, metric) sorted by name and labels"""
+        with self.lock:
+            items = sorted(self.metrics.items(), key=lambda item: item[0])
+        for (name, labels), metric in items:
+            yield name, dict(labels), metric
+
+    def to_prometheus(self):
+        lines = []
+        seen = set()
+        for name, labels, metric in self.collect():
+            full = PREFIX + name
+            if name not in seen:
+                seen.add(name)
+                lines.append(f'# HELP {full} {HELP.get(name, name)}')
+                lines.append(f'# TYPE {full} {metric.kind}')
+            if metric.kind == 'counter':
+                lines.append(f'{full}{format_labels(labels)} {metric.value}')
+                continue
+            for bound, count in metric.cumulative():
+                le = '+Inf' if bound == float('inf') else repr(float(bound))
+                lines.append(f'{full}_bucket{format_labels(dict(labels, le=le))} {count}')
+            lines.append(f'{full}_sum{format_labels(labels)} {metric.sum}')
+            lines.append(f'{full}_count{format_labels(labels)} {metric.count}')
+        return '\n'.join(lines) + '\n'
+
+    def to_json(self):
+        data = {}
+        for name, labels, metric in self.collect():
+            data.setdefault(PREFIX + name, []).append({'labels': labels, **metric.snapshot()})
+        return data
+
+    def write(self, path):
+        """Atomically write a JSON (*.json) or Prometheus text-file export"""
+        if path.endswith('.json'):
+            body = json.dumps(self.to_json(), indent=2) + '\n'
+        else:
+            body = self.to_prometheus()
+        temp = f'{path}.tmp'
+        with open(temp, 'w') as handle:
+            handle.write(body)
+        os.replace(temp, path)
+
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    pairs = ','.join(f'{key}="{str(value)}"' for key, value in sorted(labels.items()))
+    return '{' + pairs + '}'
+
+
+class ScanTimer:
+    """Per-scan phase timings, reported to the registry as the scan moves along"""
+
+    def __init__(self, metrics=None):
+        self.metrics = metrics or get_metrics()
+        self.state = None
+        self.state_since = None
+        self.cooldown_since = None
+        self.polls = 0
+        self.retries = 0
+        # Seconds spent in each state, kept on the scan for callers that want them
+        self.phases = {}
+
+    def call(self, method, action, seconds):
+        self.metrics.observe('api_call_seconds', seconds, call=f'{method} {action}')
+
+    def waited(self, budget, seconds):
+        self.metrics.observe('ratelimit_wait_seconds', seconds, budget=budget)
+
+    def retry(self, reason):
+        self.retries += 1
+        self.metrics.inc('api_retries_total', reason=reason)
+
+    def poll(self):
+        self.polls += 1
+
+    def state_changed(self, state):
+        now = time.monotonic()
+        if state == self.state:
+            return
+        self.close_state(now)
+        self.state = state
+        self.state_since = now
+
+    def close_state(self, now):
+        if self.state is not None and self.state_since is not None:
+            seconds = now - self.state_since
+            self.phases[self.state] = self.phases.get(self.state, 0) + seconds
+            self.metrics.observe('scan_state_seconds', seconds, state=self.state)
+        self.state_since = None
+
+    def cooldown_started(self):
+        if self.cooldown_since is None:
+            self.cooldown_since = time.monotonic()
+
+    def cooldown_ended(self):
+        if self.cooldown_since is not None:
+            seconds = time.monotonic() - self.cooldown_since
+            self.phases['COOLDOWN'] = self.phases.get('COOLDOWN', 0) + seconds
+            self.metrics.observe('scan_cooldown_seconds', seconds)
+            self.cooldown_since = None
+
+    def finished(self, duration, cached=False):
+        if cached:
+            self.metrics.inc('scans_total', result='cached')
+            return
+        self.close_state(time.monotonic())
+        self.metrics.inc('scans_total', result='scanned')
+        self.metrics.observe('scan_polls', self.polls, buckets=POLL_BUCKETS)
+        self.metrics.observe('scan_duration_seconds', duration)
+
+
+def get_metrics():
+    """Return the metrics registry shared by this process"""
+    global _metrics
+    if _metrics is None:
+        with _lock:
+            if _metrics is None:
+                _metrics = MetricsRegistry()
+    return _metrics
@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+
+"""
+Local stand-in for the Observatory v2 API.
+
+Serves POST/GET /api/v2/analyze and GET /api/v2/getScanResults with the
+response shapes Scanner expects, plus GET /__stats with per-endpoint call
+counts. Latency, PENDING/RUNNING durations, cooldown responses and
+error injection are configurable so scans can be exercised offline.
+
+Usage: python3 mock_api.py [--port N] [--latency S] [--pending S] [--running S]
+                           [--instant-rate P] [--cooldown-rate P] [--error-rate P] [--throttle-rate P]
+"""
+
+import sys
+import json
+import time
+import random
+import zlib
+import argparse
+import itertools
+import threading
+from collections import Counter
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+
+PREFIX = '/api/v2/'
+
+# (test key, name, score_modifier when failing)
+TESTS = [
+    ('content-security-policy', 'Content Security Policy', -25),
+    ('cookies', 'Cookies', -20),
+    ('cross-origin-resource-sharing', 'Cross-origin Resource Sharing', -50),
+    ('redirection', 'Redirection', -20),
+    ('referrer-policy', 'Referrer Policy', -5),
+    ('strict-transport-security', 'HTTP Strict Transport Security', -20),
+    ('subresource-integrity', 'Subresource Integrity', -5),
+    ('x-content-type-options', 'X-Content-Type-Options', -5),
+    ('x-frame-options', 'X-Frame-Options', -20),
+    ('cross-origin-resource-policy', 'Cross Origin Resource Policy', -5),
+]
+
+
+def make_tests(host, scan_id):
+    """Deterministic per-host results; a few tests flip between scans"""
+    tests = {}
+    for index, (key, name, penalty) in enumerate(TESTS):
+        seed = zlib.crc32(f'{host}/{key}'.encode()) + (scan_id if index % 4 == 0 else 0)
+        outcome = seed % 3
+        passed = True if outcome == 0 else False if outcome == 1 else None
+        tests[key] = {
+            'name': name,
+            'pass': passed,
+            'score_modifier': penalty if passed is False else 0,
+            'score_description': f'<code>{name}</code> {"implemented" if passed else "not implemented" if passed is False else "not applicable"} on {host}.',
+        }
+    return tests
+
+
+class MockObservatory:
+    """Scan state and fault injection shared by every request handler"""
+
+    def __init__(self, latency=0.0, pending=2.0, running=1.0, instant_rate=0.0,
+                 cooldown_rate=0.0, error_rate=0.0, throttle_rate=0.0, seed=None):
+        self.latency = latency
+        self.pending = pending
+        self.running = running
+        self.instant_rate = instant_rate
+        self.cooldown_rate = cooldown_rate
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.random = random.Random(seed)
+        self.ids = itertools.count(1)
+        self.scans = {}
+        self.by_id = {}
+        self.calls = Counter()
+        self.lock = threading.Lock()
+
+    def roll(self, rate):
+        with self.lock:
+            return rate > 0 and self.random.random() < rate
+
+    def fault(self):
+        """Return an injected (status, headers) or None"""
+        if self.roll(self.throttle_rate):
+            return 429, {'Retry-After': '1'}
+        if self.roll(self.error_rate):
+            return 503, {}
+        return None
+
+    def state(self, host):
+        scan = self.scans.get(host)
+        if scan is None:
+            return None, None
+        elapsed = time.monotonic() - scan['started']
+        if elapsed < self.pending:
+            return scan['id'], 'PENDING'
+        if elapsed < self.pending + self.running:
+            return scan['id'], 'RUNNING'
+        return scan['id'], 'FINISHED'
+
+    def analyze(self, host):
+        if self.roll(self.cooldown_rate):
+            return {'error': 'rescan-attempt-too-soon', 'text': 'Rescan attempt is sooner than the allowed cooldown period'}
+        instant = self.roll(self.instant_rate)
+        with self.lock:
+            scan_id = next(self.ids)
+            started = time.monotonic() - (self.pending + self.running if instant else 0)
+            self.scans[host] = self.by_id[scan_id] = {'id': scan_id, 'host': host, 'started': started}
+        if instant:
+            return {'scan': {'id': scan_id, 'error': None, 'state': 'FINISHED'}, 'tests': make_tests(host, scan_id)}
+        return {'state': 'PENDING', 'scan_id': scan_id}
+
+    def status(self, host):
+        scan_id, state = self.state(host)
+        if scan_id is None:
+            return {'error': 'recent-scan-not-found', 'text': f'No recent scan for {host}'}
+        return {'state': state, 'scan_id': scan_id}
+
+    def results(self, scan_id):
+        scan = self.by_id.get(scan_id)
+        if scan is None:
+            return None
+        if time.monotonic() - scan['started'] < self.pending + self.running:
+            return {'error': 'scan-not-finished', 'text': f'Scan {scan_id} has not finished'}
+        return make_tests(scan['host'], scan_id)
+
+    def stats(self):
+        with self.lock:
+            return {'calls': dict(self.calls), 'total': sum(self.calls.values()), 'scans': len(self.scans)}
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    api = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, payload, status=200, headers=None):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def handle_api(self, method):
+        url = urlparse(self.path)
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+        if url.path == '/__stats':
+            return self.send_json(self.api.stats())
+        if not url.path.startswith(PREFIX):
+            return self.send_json({'error': 'not-found', 'text': url.path}, 404)
+
+        action = url.path[len(PREFIX):]
+        with self.api.lock:
+            self.api.calls[f'{method} {action}'] += 1
+        if self.api.latency:
+            time.sleep(self.api.latency * self.api.random.uniform(0.5, 1.5))
+        fault = self.api.fault()
+        if fault is not None:
+            status, headers = fault
+            return self.send_json({'error': 'injected', 'text': f'Injected {status}'}, status, headers)
+
+        if action == 'analyze' and 'host' in query:
+            return self.send_json(self.api.analyze(query['host']) if method == 'POST' else self.api.status(query['host']))
+        if action == 'getScanResults' and method == 'GET' and 'scan' in query:
+            tests = self.api.results(int(query['scan']))
+            if tests is not None:
+                return self.send_json(tests)
+            return self.send_json({'error': 'scan-not-found', 'text': f'No scan {query["scan"]}'}, 404)
+        return self.send_json({'error': 'bad-request', 'text': f'{method} {action}'}, 400)
+
+    def do_GET(self):
+        self.handle_api('GET')
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        self.handle_api('POST')
+
+
+def make_server(api, host='127.0.0.1', port=0):
+    """Bind a threaded HTTP server for api; port 0 picks a free port"""
+    handler = type('Handler', (MockHandler,), {'api': api})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a local mock of the Observatory v2 API")
+    parser.add_argument("--host", default="127.0.0.1", help="Address to bind")
+    parser.add_argument("--port", type=int, default=8765, help="Port to bind, 0 picks a free one")
+    parser.add_argument("--latency", type=float, default=0.0, help="Mean seconds added to every response")
+    parser.add_argument("--pending", type=float, default=2.0, help="Seconds a new scan reports PENDING")
+    parser.add_argument("--running", type=float, default=1.0, help="Seconds a scan then reports RUNNING")
+    parser.add_argument("--instant-rate", type=float, default=0.0, help="Share of analyze calls that return finished results at once")
+    parser.add_argument("--cooldown-rate", type=float, default=0.0, help="Share of analyze calls answered with a cooldown error")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of calls answered with HTTP 503")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Share of calls answered with HTTP 429")
+    parser.add_argument("--seed", type=int, default=None, help="Seed for reproducible fault injection")
+    options = parser.parse_args()
+
+    api = MockObservatory(
+        options.latency, options.pending, options.running, options.instant_rate,
+        options.cooldown_rate, options.error_rate, options.throttle_rate, options.seed,
+    )
+    server = make_server(api, options.host, options.port)
+    host, port = server.server_address[:2]
+    # First line is read by bench.py to find the port
+    print(f"Listening on http://{host}:{port}{PREFIX}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+
+import re
+import sys
+from functools import lru_cache
+import config
+
+
+HTML_TAG = re.compile(r'<[^>]+>')
+WHITESPACE = re.compile(r'\s+')
+
+STATUS_LABELS = {True: "✅ PASS", False: "❌ FAIL", None: "⚠️  INFO"}
+
+
+@lru_cache(maxsize=4096)
+def clean_description(text):
+    """Strip HTML tags and collapse whitespace; descriptions repeat across hosts"""
+    if not text:
+        return text
+    return WHITESPACE.sub(' ', HTML_TAG.sub('', text)).strip()
+
+
+@lru_cache(maxsize=4096)
+def shorten(text, limit=config.MAX_DESCRIPTION_LENGTH):
+    if not text or len(text) <= limit:
+        return text
+    return text[:limit] + "..."
+
+
+class TestRecord:
+    """Compact view of one test from a getScanResults payload"""
+
+    __slots__ = ('key', 'name', 'passed', 'score_modifier', 'description')
+
+    def __init__(self, key, name, passed, score_modifier, description):
+        self.key = key
+        self.name = name
+        self.passed = passed
+        self.score_modifier = score_modifier
+        self.description = description
+
+    @classmethod
+    def from_payload(cls, key, test):
+        passed = test['pass']
+        return cls(
+            sys.intern(key),
+            sys.intern(test['name']),
+            passed if passed is None else bool(passed),
+            test['score_modifier'],
+            clean_description(test['score_description']),
+        )
+
+    @property
+    def status(self):
+        return STATUS_LABELS[self.passed]
+
+    @property
+    def score(self):
+        return f"{self.score_modifier:+d}" if self.score_modifier != 0 else "0"
+
+    @property
+    def short_description(self):
+        return shorten(self.description)
+
+
+def normalize_results(payload):
+    """Turn a getScanResults payload into a list of TestRecords"""
+    return [TestRecord.from_payload(key, test) for key, test in payload.items()]
+
+
+def summarize(records):
+    """Return (total, passed, failed, info) counts for a list of TestRecords"""
+    total = len(records)
+    passed = sum(1 for record in records if record.passed is True)
+    failed = sum(1 for record in records if record.passed is False)
+    return total, passed, failed, total - passed - failed
@@ -0,0 +1,157 @@
+#!/usr/bin/env python
+
+"""
+Programmatic interface to the scanner for embedding in other Python code.
+
+    import observer
+
+    result = observer.scan('example.com', timeout=300)
+    print(result.host, result.passed, result.failed)
+
+    for result in observer.scan_many(hosts, concurrency=16, max_age=3600):
+        if result.ok:
+            ...
+
+Results come back as ScanResult objects in completion order. Nothing is
+printed: progress and warnings go to the 'observer' logger, which
+propagates to the application's own logging configuration.
+"""
+
+import collections
+import config
+from targets import get_target_filter, is_valid_domain, normalize_host
+from normalize import normalize_results, summarize
+
+
+class ScanOptions:
+    """The settings a Scanner reads, without going through argparse"""
+
+    def __init__(self, target=None, timeout=None, use_cache=True, max_age=None, api_base=None, verbose=False):
+        self.target = target
+        self.scan_timeout = config.SCAN_TIMEOUT if timeout is None else timeout
+        self.use_cache = use_cache
+        self.max_age = max_age
+        self.api_base = api_base
+        self.verbosity = verbose
+
+
+class ScanResult:
+    """One host's finished scan, or the error that ended it"""
+
+    def __init__(self, host, scan=None, error=None):
+        self.host = host
+        self.error = error
+        self.scan_id = scan.scan_id if scan is not None else None
+        self.tests = scan.scan_result if scan is not None else None
+        self.elapsed = round(scan.end - scan.start, 3) if scan is not None else None
+        self.cached = scan is not None and scan.cached_at is not None
+        self.scanned_at = (scan.cached_at or scan.end) if scan is not None else None
+        self.total = self.passed = self.failed = self.info = 0
+        if self.tests is not None:
+            self.total, self.passed, self.failed, self.info = summarize(self.records)
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    @property
+    def records(self):
+        """The tests as normalize.TestRecord objects, in payload order like the CLI table"""
+        return normalize_results(self.tests) if self.tests is not None else []
+
+    def to_dict(self):
+        if self.error is not None:
+            return {'host': self.host, 'error': str(self.error)}
+        return {
+            'host': self.host,
+            'scan_id': self.scan_id,
+            'elapsed': self.elapsed,
+            'cached': self.cached,
+            'scanned_at': self.scanned_at,
+            'tests': self.tests,
+        }
+
+    def __repr__(self):
+        if self.error is not None:
+            return f'<ScanResult {self.host} error={self.error!r}>'
+        return f'<ScanResult {self.host} scan_id={self.scan_id} passed={self.passed}/{self.total}>'
+
+
+def check_host(host):
+    """Return the normalized host, or raise ValueError if it is malformed or not permitted"""
+    normalized = normalize_host(host)
+    if not normalized or not is_valid_domain(normalized):
+        raise ValueError(f'Invalid domain format: {host}')
+    reason = get_target_filter().check(normalized)
+    if reason is not None:
+        raise ValueError(f'Domain {reason} by configuration: {host}')
+    return normalized
+
+
+def quiet():
+    """Keep library calls off stdout unless the CLI has already set up logging"""
+    from log import use_host_logging
+
+    use_host_logging()
+
+
+def checked(hosts, rejected):
+    """Yield valid hosts lazily, queueing a failed ScanResult for each invalid one"""
+    for host in hosts:
+        try:
+            yield check_host(host)
+        except ValueError as err:
+            rejected.append(ScanResult(host, error=err))
+
+
+def scan_many(hosts, concurrency=None, timeout=None, use_cache=True, max_age=None, api_base=None):
+    """Scan hosts concurrently, yielding a ScanResult for each as it finishes
+
+    timeout bounds each scan in seconds (0 waits forever), use_cache and
+    max_age control reuse of the local result cache, and concurrency caps
+    the scans in flight. Failed hosts are yielded with .error set rather
+    than raised, so one bad host never ends the iteration.
+    """
+    from batch import BatchRunner
+
+    quiet()
+    options = ScanOptions(timeout=timeout, use_cache=use_cache, max_age=max_age, api_base=api_base)
+    rejected = collections.deque()
+    results = BatchRunner(options, checked(hosts, rejected), concurrency).run()
+    try:
+        for target, scan, err in results:
+            while rejected:
+                yield rejected.popleft()
+            yield ScanResult(target, scan, err)
+    finally:
+        # Stopping early releases the runner's in-flight hosts now, not whenever it is collected
+        results.close()
+    while rejected:
+        yield rejected.popleft()
+
+
+async def scan_many_async(hosts, concurrency=None, timeout=None, use_cache=True, max_age=None, api_base=None):
+    """scan_many for asyncio applications: an async iterator running on the caller's event loop"""
+    from async_scanner import AsyncBatchRunner
+
+    quiet()
+    options = ScanOptions(timeout=timeout, use_cache=use_cache, max_age=max_age, api_base=api_base)
+    rejected = collections.deque()
+    results = AsyncBatchRunner(options, checked(hosts, rejected), concurrency).run()
+    try:
+        async for target, scan, err in results:
+            while rejected:
+                yield rejected.popleft()
+            yield ScanResult(target, scan, err)
+    finally:
+        await results.aclose()
+    while rejected:
+        yield rejected.popleft()
+
+
+def scan(host, timeout=None, use_cache=True, max_age=None, api_base=None):
+    """Scan one host and return its ScanResult, raising the error if the scan failed"""
+    result = next(scan_many([host], 1, timeout, use_cache, max_age, api_base))
+    if result.error is not None:
+        raise result.error
+    return result
@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+
+import time
+import random
+import config
+
+
+class ScanTimeout(Exception):
+    """Raised when a scan does not finish before its deadline"""
+
+
+class ScanCancelled(Exception):
+    """Raised inside a Scanner once its cancel event is set"""
+
+
+class PollPolicy:
+    """State-driven delays between check_results() calls with a per-scan deadline"""
+
+    def __init__(self, timeout=None, initial=None, interval=None, maximum=None, backoff=None, jitter=None):
+        self.timeout = config.SCAN_TIMEOUT if timeout is None else timeout
+        self.initial = initial or config.SCAN_POLL_INITIAL
+        self.interval = interval or config.SCAN_CHECK_INTERVAL
+        self.maximum = maximum or config.SCAN_POLL_MAX
+        self.backoff = backoff or config.SCAN_POLL_BACKOFF
+        self.jitter = config.SCAN_POLL_JITTER if jitter is None else jitter
+        self.start()
+
+    def start(self):
+        """Reset the schedule and deadline, called right after begin()"""
+        self.deadline = time.monotonic() + self.timeout if self.timeout else None
+        self.delay = None
+        self.last_state = None
+
+    def remaining(self):
+        if self.deadline is None:
+            return None
+        return self.deadline - time.monotonic()
+
+    def expired(self):
+        remaining = self.remaining()
+        return remaining is not None and remaining <= 0
+
+    def next_delay(self, state):
+        """Seconds to wait before the next poll of a scan in `state`"""
+        if self.delay is None:
+            # First check right after begin(): small scans often finish at once
+            self.delay = self.initial
+        elif state != self.last_state:
+            # RUNNING scans finish soon; PENDING ones wait in the Observatory queue
+            self.delay = self.initial if state == 'RUNNING' else self.interval
+        else:
+            cap = self.interval if state == 'RUNNING' else self.maximum
+            self.delay = min(self.delay * self.backoff, cap)
+        self.last_state = state
+
+        delay = self.delay * random.uniform(1 - self.jitter, 1 + self.jitter)
+        remaining = self.remaining()
+        if remaining is not None:
+            delay = max(0, min(delay, remaining))
+        return delay
+
+    def check(self, target):
+        if self.expired():
+            raise ScanTimeout(f'{target} did not finish within {self.timeout} seconds')
@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+
+import time
+import threading
+import config
+
+
+_limiters = {}
+_lock = threading.Lock()
+
+
+def parse_retry_after(value):
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP-date)"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    from email.utils import parsedate_to_datetime
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """Thread-safe token bucket that slows down when the API throttles us"""
+
+    def __init__(self, rate, burst):
+        self.max_rate = rate
+        self.min_rate = rate * config.API_RATE_MIN_FRACTION
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.paused_until = 0
+        self.lock = threading.Lock()
+
+    def reserve(self):
+        """Take a token and return how many seconds to wait before using it"""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            # Tokens may go negative: later callers queue up behind earlier ones
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0
+            return max(wait, self.paused_until - now)
+
+    def acquire(self):
+        delay = self.reserve()
+        if delay > 0:
+            time.sleep(delay)
+
+    def throttled(self, retry_after=None):
+        """Halve the rate and pause everyone for retry_after seconds"""
+        with self.lock:
+            now = time.monotonic()
+            self.rate = max(self.min_rate, self.rate / 2)
+            self.tokens = min(self.tokens, 0)
+            self.paused_until = max(self.paused_until, now + (retry_after if retry_after is not None else 1 / self.rate))
+
+    def succeeded(self):
+        """Creep back towards the configured rate after each accepted call"""
+        if self.rate < self.max_rate:
+            with self.lock:
+                self.rate = min(self.max_rate, self.rate + self.max_rate * config.API_RATE_RECOVERY)
+
+
+def get_limiter(budget):
+    """Return the process-wide bucket for the 'analyze' or 'results' budget"""
+    limiter = _limiters.get(budget)
+    if limiter is None:
+        with _lock:
+            limiter = _limiters.get(budget)
+            if limiter is None:
+                rate, burst = config.API_RATE_LIMITS[budget]
+                limiter = _limiters[budget] = TokenBucket(rate, burst)
+    return limiter
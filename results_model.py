@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+
+from PySide6.QtCore import Qt, QAbstractTableModel, QModelIndex, QSortFilterProxyModel, QTimer
+from PySide6.QtGui import QColor
+
+
+STATUS_COLORS = {
+    True: QColor("#90EE90"),  # Light green
+    False: QColor("#FFB6C1"),  # Light red
+    None: QColor("#FFE4B5"),  # Light orange
+}
+
+# Sort FAIL before INFO before PASS so problems float to the top
+STATUS_ORDER = {False: 0, None: 1, True: 2}
+
+
+class ResultRow:
+    """One test of one host as shown in the results table"""
+
+    __slots__ = ('host', 'record', 'search')
+
+    def __init__(self, host, record):
+        self.host = host
+        self.record = record
+        self.search = f"{host}\t{record.name}\t{record.status}\t{record.description or ''}".lower()
+
+
+# Plain Python sort keys per column; sorting in Python is far cheaper than
+# letting Qt call data() for every comparison on 100k rows
+SORT_KEYS = [
+    lambda row: row.host,
+    lambda row: row.record.name,
+    lambda row: STATUS_ORDER[row.record.passed],
+    lambda row: row.record.score_modifier,
+    lambda row: row.record.description or '',
+]
+
+
+class ResultsModel(QAbstractTableModel):
+    """Table model over normalized test records for any number of hosts"""
+
+    COLUMNS = ["Host", "Test", "Status", "Score", "Description"]
+
+    def __init__(self, parent=None, flush_interval=100):
+        super().__init__(parent)
+        self.rows = []
+        self.queued = []
+        self.sort_column = None
+        self.sort_order = Qt.AscendingOrder
+        self.flush_timer = QTimer(self)
+        self.flush_timer.setSingleShot(True)
+        self.flush_timer.setInterval(flush_interval)
+        self.flush_timer.timeout.connect(self.flush)
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.COLUMNS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.COLUMNS[section]
+        return None
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        row = self.rows[index.row()]
+        record = row.record
+        column = index.column()
+
+        if role == Qt.DisplayRole:
+            if column == 0:
+                return row.host
+            if column == 1:
+                return record.name
+            if column == 2:
+                return record.status
+            if column == 3:
+                return record.score
+            return record.short_description
+        if role == Qt.BackgroundRole and column == 2:
+            return STATUS_COLORS[record.passed]
+        if role == Qt.ToolTipRole and column == 4:
+            return record.description
+        return None
+
+    def flags(self, index):
+        return Qt.ItemIsEnabled | Qt.ItemIsSelectable
+
+    def add_results(self, host, records):
+        """Queue one host's records; rows are inserted in batches"""
+        self.queued.extend(ResultRow(host, record) for record in records)
+        if not self.flush_timer.isActive():
+            self.flush_timer.start()
+
+    def flush(self):
+        if not self.queued:
+            return
+        first = len(self.rows)
+        self.beginInsertRows(QModelIndex(), first, first + len(self.queued) - 1)
+        self.rows.extend(self.queued)
+        self.queued = []
+        self.endInsertRows()
+        if self.sort_column is not None:
+            self.sort(self.sort_column, self.sort_order)
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        self.sort_column = column
+        self.sort_order = order
+        self.layoutAboutToBeChanged.emit()
+        self.rows.sort(key=SORT_KEYS[column], reverse=order == Qt.DescendingOrder)
+        self.layoutChanged.emit()
+
+    def clear(self):
+        self.flush_timer.stop()
+        self.queued = []
+        self.beginResetModel()
+        self.rows = []
+        self.endResetModel()
+
+
+class ResultsFilterProxy(QSortFilterProxyModel):
+    """Case-insensitive substring filter over every column of a ResultsModel"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.needle = ''
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        # Let the source model sort its own rows; the proxy only filters
+        self.sourceModel().sort(column, order)
+
+    def set_filter_text(self, text):
+        self.needle = text.strip().lower()
+        self.invalidateFilter()
+
+    def filterAcceptsRow(self, source_row, source_parent):
+        if not self.needle:
+            return True
+        return self.needle in self.sourceModel().rows[source_row].search
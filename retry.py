@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+
+import time
+import random
+import threading
+import config
+
+
+# Statuses worth retrying: the request may succeed unchanged a moment later
+TRANSIENT_STATUS = {408, 425, 429, 500, 502, 503, 504}
+
+_breaker = None
+_lock = threading.Lock()
+
+
+def backoff_delay(attempt):
+    """Exponential backoff with jitter for the given zero-based retry attempt"""
+    delay = min(config.API_RETRY_MAX_DELAY, config.API_RETRY_BACKOFF * 2 ** attempt)
+    return delay * random.uniform(0.5, 1.0)
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling the API while the circuit breaker is open"""
+
+    def __init__(self, retry_in):
+        super().__init__(f'Observatory API unavailable, retrying in {retry_in:.0f} seconds')
+        self.retry_in = retry_in
+
+
+class CircuitBreaker:
+    """Stop calling an API that keeps failing until a probe call succeeds"""
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half-open'
+
+    def __init__(self, threshold=None, reset_timeout=None):
+        self.threshold = threshold or config.API_BREAKER_THRESHOLD
+        self.reset_timeout = reset_timeout or config.API_BREAKER_RESET
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0
+        self.probing = False
+        self.lock = threading.Lock()
+
+    def before_call(self):
+        """Raise CircuitOpenError unless a call may go out now; return whether the call is the probe"""
+        with self.lock:
+            if self.state == self.CLOSED:
+                return False
+            if self.state == self.OPEN and time.monotonic() >= self.opened_at + self.reset_timeout:
+                self.state = self.HALF_OPEN
+                self.probing = False
+            if self.state == self.HALF_OPEN and not self.probing:
+                # Let exactly one probe through to test the water
+                self.probing = True
+                return True
+            raise CircuitOpenError(self._retry_in())
+
+    def record_success(self):
+        with self.lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self.probing = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.threshold:
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+                self.probing = False
+
+    def abandon(self):
+        """Count a probe that ended without an answer as failed, so a later call can probe again"""
+        with self.lock:
+            if self.state == self.HALF_OPEN and self.probing:
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+                self.probing = False
+
+    def _retry_in(self):
+        if self.state == self.OPEN:
+            return max(0, self.opened_at + self.reset_timeout - time.monotonic())
+        if self.state == self.HALF_OPEN:
+            return 1.0
+        return 0
+
+    def retry_in(self):
+        """Seconds until new work should be sent, 0 while the circuit is closed"""
+        with self.lock:
+            return self._retry_in()
+
+
+def get_breaker():
+    """Return the circuit breaker shared by every Scanner in this process"""
+    global _breaker
+    if _breaker is None:
+        with _lock:
+            if _breaker is None:
+                _breaker = CircuitBreaker()
+    return _breaker
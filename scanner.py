@@ -1,66 +1,167 @@
-import requests
 import time
-from requests.exceptions import HTTPError
 from urllib.parse import urlencode
 from utils import Utils
+from session import get_session
+from polling import PollPolicy, ScanCancelled
+from cache import get_cache
+from ratelimit import get_limiter, parse_retry_after
+from metrics import ScanTimer
+from retry import TRANSIENT_STATUS, CircuitOpenError, backoff_delay, get_breaker
+import config
 
 
 class Scanner:
-    def __init__(self, options):
+    def __init__(self, options, session=None, cache=None, cancel=None):
         self.options = options
-        self.base = 'https://observatory-api.mdn.mozilla.net/api/v2/'
+        # Created on first use so cache hits never load requests
+        self.session = session
+        if cache is None and getattr(options, 'use_cache', False):
+            cache = get_cache()
+        self.cache = cache
+        # threading.Event checked between API calls and during every wait
+        self.cancel = cancel
+        self.base = getattr(options, 'api_base', None) or config.API_BASE_URL
         self.start = time.time()
         self.end = None
         self.scan_id = None
         self.state = None
         self.running = True
+        self.cooldown_until = None
+        self.cached_at = None
+        # Deadline kept across every time the runner parks this scan behind an open circuit
+        self.blocked = None
+        # scan_id of an interrupted run's submission, picked up by the batch runner
+        self.resume_id = None
 
         self.utils = Utils()
+        self.timer = ScanTimer()
         self.status_result = None
         self.scan_result = None
 
+    def msg(self, text, level):
+        self.utils.msg(text, level, host=self.options.target, scan_id=self.scan_id, state=self.state)
+
+    def sleep(self, seconds):
+        """Sleep, waking early and raising ScanCancelled if the scan is cancelled"""
+        if self.cancel is None:
+            if seconds > 0:
+                time.sleep(seconds)
+        elif self.cancel.wait(max(0, seconds)):
+            raise ScanCancelled(f'Scan of {self.options.target} was cancelled')
+
+    def request(self, method, budget, url, **kwargs):
+        """Send one API call through the rate limiter and circuit breaker, retrying transient failures"""
+        from requests.exceptions import ConnectionError, Timeout
+
+        if self.session is None:
+            self.session = get_session()
+        limiter = get_limiter(budget)
+        breaker = get_breaker()
+        action = url[len(self.base):].split('?', 1)[0]
+        for attempt in range(config.API_RETRY_ATTEMPTS + 1):
+            last = attempt == config.API_RETRY_ATTEMPTS
+            delay = limiter.reserve()
+            self.timer.waited(budget, delay)
+            self.sleep(delay)
+            probe = breaker.before_call()
+            started = time.perf_counter()
+            try:
+                response = self.session.request(method, url, timeout=config.API_TIMEOUT, **kwargs)
+                self.timer.call(method, action, time.perf_counter() - started)
+            except (ConnectionError, Timeout) as err:
+                breaker.record_failure()
+                if last:
+                    raise
+                delay = backoff_delay(attempt)
+                self.timer.retry(err.__class__.__name__)
+                self.msg(f'{err.__class__.__name__} talking to the API, retrying in {delay:.1f} seconds', 'warn')
+                self.sleep(delay)
+                continue
+            except BaseException:
+                # A probe that never got an answer must not hold the half-open breaker forever
+                if probe:
+                    breaker.abandon()
+                raise
+
+            if response.status_code == 429:
+                # Throttling means the API is up; the limiter handles the wait
+                breaker.record_success()
+                retry_after = parse_retry_after(response.headers.get('Retry-After'))
+                limiter.throttled(retry_after)
+                self.timer.retry('429')
+                self.msg(f'Rate limited by the API, backing off{f" {retry_after:.0f} seconds" if retry_after else ""}', 'warn')
+            elif response.status_code in TRANSIENT_STATUS:
+                breaker.record_failure()
+                if not last:
+                    delay = backoff_delay(attempt)
+                    self.timer.retry(str(response.status_code))
+                    self.msg(f'API returned {response.status_code}, retrying in {delay:.1f} seconds', 'warn')
+                    self.sleep(delay)
+            else:
+                breaker.record_success()
+                limiter.succeeded()
+                # Got through, so a later outage starts a fresh deadline
+                self.blocked = None
+                return response
+        return response
+
     def make_post(self, action, params):
+        from requests.exceptions import HTTPError
+
         try:
-            response = requests.post(f'{self.base}{action}?host={self.options.target}', params)
+            response = self.request('POST', 'analyze', f'{self.base}{action}', params={'host': self.options.target}, data=params)
             response.raise_for_status()
+            result = response.json()
             if self.options.verbosity:
-                print('Scan initiation response: ', end='')
-                print(response.json())
-            return response.json()
+                self.msg(f'Scan initiation response: {result}', 'verbose')
+            return result
         except HTTPError as http_err:
-            self.utils.msg(f'HTTP error occurred: {http_err}', 'error')
+            self.msg(f'HTTP error occurred: {http_err}', 'error')
+            raise
+        except CircuitOpenError:
+            # Not a failure of this scan; the runner parks it until the API is back
             raise
         except Exception as err:
-            self.utils.msg(f'Other error occurred: {err}', 'error')
+            self.msg(f'Other error occurred: {err}', 'error')
             raise
 
     def make_get(self, action, params):
+        from requests.exceptions import HTTPError
+
         try:
             p = urlencode(params)
-            response = requests.get(f'{self.base}{action}?{p}')
+            response = self.request('GET', 'results', f'{self.base}{action}?{p}')
+            response.raise_for_status()
+            result = response.json()
             if self.options.verbosity:
-                print(f'{action} response: ', end='')
-                print(response.json())
-            return response.json()
+                self.msg(f'{action} response: {result}', 'verbose')
+            return result
         except HTTPError as http_err:
-            self.utils.msg(f'HTTP error occurred: {http_err}', 'error')
+            self.msg(f'HTTP error occurred: {http_err}', 'error')
+            raise
+        except CircuitOpenError:
             raise
         except Exception as err:
-            self.utils.msg(f'Other error occurred: {err}', 'error')
+            self.msg(f'Other error occurred: {err}', 'error')
             raise
 
     def begin(self):
+        if self.load_cached():
+            return
+
         result = self.make_post('analyze', {'hidden': 'true', 'rescan': 'true'})
 
         if "error" in result:
             err = result['text']
             if "cooldown" in err:
                 if self.running != 'cooldown':
-                    self.utils.msg(f'{self.options.target} is in cooldown. Waiting 3 minutes as required by the API.', 'warn')
+                    self.msg(f'{self.options.target} is in cooldown. Waiting {config.SCAN_COOLDOWN_WAIT} seconds as required by the API.', 'warn')
+                # Park instead of sleeping; the caller decides how to spend the wait
                 self.running = 'cooldown'
-                self.utils.countdown(int(3*60), self.rescan)
+                self.timer.cooldown_started()
+                self.cooldown_until = time.monotonic() + config.SCAN_COOLDOWN_WAIT
             else:
-                self.utils.msg(err, 'error')
+                self.msg(err, 'error')
                 raise Exception(err)
         else:
             # Check if scan is already complete
@@ -70,18 +171,40 @@ class Scanner:
                 self.scan_result = result['tests']
                 self.running = False
                 self.end = time.time()
+                self.timer.finished(self.end - self.start)
+                self.store_cached()
             else:
                 # Scan is in progress, extract state and scan_id
                 self.state = result.get('state', 'UNKNOWN')
+                self.timer.state_changed(self.state)
                 self.scan_id = result.get('scan_id')
 
+    def resume(self, scan_id):
+        """Pick up a scan submitted by an earlier run instead of starting a new one"""
+        self.scan_id = scan_id
+        response = self.request('GET', 'results', f'{self.base}getScanResults?{urlencode({"scan": scan_id})}')
+        result = response.json() if response.ok else None
+        if result and 'error' not in result:
+            self.msg(f'Resumed scan {scan_id} of {self.options.target}', 'info')
+            self.scan_result = result
+            self.running = False
+            self.end = time.time()
+            self.timer.finished(self.end - self.start)
+            self.store_cached()
+        elif response.status_code != 404:
+            # Not finished yet: keep polling it rather than submitting a new analyze
+            self.state = 'PENDING'
+            self.timer.state_changed(self.state)
+
     def check_results(self):
         self.status_result = self.make_get('analyze', {'host': self.options.target})
+        self.timer.poll()
 
         if 'error' in self.status_result:
-            self.utils.msg(self.status_result['text'], 'error')
+            self.msg(self.status_result['text'], 'error')
         else:
             self.state = self.status_result['state']
+            self.timer.state_changed(self.state)
 
         if self.state == 'FINISHED':
             self.check_tests()
@@ -90,7 +213,45 @@ class Scanner:
         self.scan_result = self.make_get('getScanResults', {'scan': self.scan_id})
         self.running = False
         self.end = time.time()
+        self.timer.finished(self.end - self.start)
+        self.store_cached()
+
+    def load_cached(self):
+        if self.cache is None:
+            return False
+        hit = self.cache.get(self.options.target, getattr(self.options, 'max_age', None), self.base)
+        if hit is None:
+            return False
+        self.scan_id, self.scan_result, self.cached_at = hit
+        self.msg(f'Using cached results for {self.options.target} from {int(time.time() - self.cached_at)} seconds ago', 'info')
+        self.running = False
+        self.end = time.time()
+        self.timer.finished(0, cached=True)
+        return True
+
+    def store_cached(self):
+        if self.cache is not None and self.scan_result is not None:
+            self.cache.put(self.options.target, self.scan_id, self.scan_result, self.base)
+
+    def wait(self, policy=None, on_poll=None):
+        """Poll until the scan finishes, paced by a PollPolicy"""
+        if policy is None:
+            policy = PollPolicy(getattr(self.options, 'scan_timeout', None))
+        policy.start()
+        while self.running:
+            if self.running == 'cooldown':
+                self.sleep(self.cooldown_until - time.monotonic())
+                self.rescan()
+                policy.start()
+                continue
+            policy.check(self.options.target)
+            self.sleep(policy.next_delay(self.state))
+            self.check_results()
+            if on_poll is not None:
+                on_poll(self)
 
     def rescan(self):
+        if self.running == 'cooldown':
+            self.timer.cooldown_ended()
         self.running = True
         self.begin()
@@ -0,0 +1,49 @@
+#!/usr/bin/env python
+
+import time
+import heapq
+import itertools
+import threading
+import config
+
+
+class CooldownScheduler:
+    """Min-heap that parks items until the monotonic time they become eligible"""
+
+    def __init__(self):
+        self.heap = []
+        self.counter = itertools.count()
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.heap)
+
+    def park(self, item, eligible_at=None):
+        if eligible_at is None:
+            eligible_at = time.monotonic() + config.SCAN_COOLDOWN_WAIT
+        with self.lock:
+            # The counter breaks ties so items themselves are never compared
+            heapq.heappush(self.heap, (eligible_at, next(self.counter), item))
+
+    def pop_ready(self, limit=None):
+        """Remove and return up to `limit` items whose wait is over"""
+        ready = []
+        now = time.monotonic()
+        with self.lock:
+            while self.heap and self.heap[0][0] <= now and (limit is None or len(ready) < limit):
+                ready.append(heapq.heappop(self.heap)[2])
+        return ready
+
+    def drain(self):
+        """Remove and return every parked item, ready or not"""
+        with self.lock:
+            items = [item for _, _, item in self.heap]
+            self.heap = []
+        return items
+
+    def next_delay(self):
+        """Seconds until the next item becomes eligible, or None when empty"""
+        with self.lock:
+            if not self.heap:
+                return None
+            return max(0, self.heap[0][0] - time.monotonic())
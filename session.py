@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+
+import threading
+import config
+
+
+_session = None
+_pool_size = 0
+_lock = threading.Lock()
+
+
+def mount_pool(session, pool_maxsize=None):
+    from requests.adapters import HTTPAdapter
+
+    adapter = HTTPAdapter(
+        pool_connections=config.API_POOL_CONNECTIONS,
+        pool_maxsize=pool_maxsize or config.API_POOL_MAXSIZE,
+    )
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+
+
+def make_session(pool_maxsize=None):
+    """Build a keep-alive session with a pooled, compressed connection to the API"""
+    import requests
+
+    session = requests.Session()
+    mount_pool(session, pool_maxsize)
+    session.headers.update({
+        'Accept': 'application/json',
+        'Accept-Encoding': 'gzip, deflate',
+        'Connection': 'keep-alive',
+    })
+    return session
+
+
+def get_session():
+    """Return the session shared by every Scanner in this process"""
+    global _session, _pool_size
+    if _session is None:
+        with _lock:
+            if _session is None:
+                _session = make_session()
+                _pool_size = config.API_POOL_MAXSIZE
+    return _session
+
+
+def configure_session(pool_maxsize):
+    """Grow the shared pool to at least pool_maxsize, e.g. to match the batch concurrency"""
+    global _session, _pool_size
+    size = max(pool_maxsize, config.API_POOL_MAXSIZE)
+    with _lock:
+        if _session is None:
+            _session = make_session(size)
+        elif size > _pool_size:
+            # Other threads may be mid-request, so swap in a larger pool rather than closing the session
+            mount_pool(_session, size)
+        _pool_size = max(_pool_size, size)
+    return _session
+
+
+def close_session():
+    global _session, _pool_size
+    with _lock:
+        if _session is not None:
+            _session.close()
+            _session = None
+            _pool_size = 0
@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+
+import json
+import hashlib
+
+
+def host_key(host):
+    """Stable 64-bit key for a host, the same on every machine and Python version"""
+    return int.from_bytes(hashlib.blake2b(host.encode(), digest_size=8).digest(), 'big')
+
+
+def jump_hash(key, buckets):
+    """Lamping and Veach's jump consistent hash: growing buckets to N moves only 1/N of the keys"""
+    bucket, jump = -1, 0
+    while jump < buckets:
+        bucket = jump
+        key = (key * 2862933555777941757 + 1) & 0xFFFFFFFFFFFFFFFF
+        jump = int((bucket + 1) * ((1 << 31) / ((key >> 33) + 1)))
+    return bucket
+
+
+def shard_of(host, count):
+    """The shard, 1..count, that owns host"""
+    return jump_hash(host_key(host), count) + 1
+
+
+def read_results(path):
+    """Yield the records of a json array or ndjson result file"""
+    with open(path, 'r') as handle:
+        start = handle.read(1)
+        while start and start.isspace():
+            start = handle.read(1)
+        if start == '[':
+            handle.seek(0)
+            yield from json.load(handle)
+            return
+        handle.seek(0)
+        for number, line in enumerate(handle, 1):
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError:
+                # The last line of a shard killed mid-write
+                if line.endswith('\n'):
+                    raise ValueError(f'{path}:{number}: not a JSON record') from None
+
+
+def newer(record, current):
+    """Whether record should replace current as a host's merged result"""
+    if current is None:
+        return True
+    # Any result beats an error; otherwise the latest scan wins
+    if ('error' in record) != ('error' in current):
+        return 'error' in current
+    return (record.get('scanned_at') or 0, record.get('scan_id') or 0) > (current.get('scanned_at') or 0, current.get('scan_id') or 0)
+
+
+def merge_results(paths):
+    """Return (shard metadata by file, {host: newest record}) across partial result files"""
+    shards = {}
+    hosts = {}
+    for path in paths:
+        meta = shards[path] = {'records': 0}
+        for record in read_results(path):
+            if 'shard' in record and 'host' not in record:
+                meta.update(record['shard'])
+                continue
+            if 'host' not in record or ('tests' not in record and 'error' not in record):
+                raise ValueError(f'{path}: merge needs host records (--records host), without --diff')
+            meta['records'] += 1
+            if newer(record, hosts.get(record['host'])):
+                hosts[record['host']] = record
+    return shards, hosts
+
+
+class StoredScan:
+    """A host record read back from a result file, shaped like a finished Scanner for the writers"""
+
+    def __init__(self, record):
+        self.scan_id = record.get('scan_id')
+        self.scan_result = record.get('tests')
+        self.end = record.get('scanned_at') or 0
+        self.start = self.end - (record.get('elapsed') or 0)
+        self.cached_at = self.end if record.get('cached') else None
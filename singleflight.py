@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+
+import threading
+from concurrent.futures import Future
+from cache import entry_key
+
+
+_registry = None
+_lock = threading.Lock()
+
+
+class InFlightRegistry:
+    """Let concurrent requests for one host share a single in-flight scan"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.flights = {}
+
+    def join(self, host, base=None):
+        """Return (future, leader); only the leader should start a scan"""
+        # Keyed like the cache, so scans against different API bases are never shared
+        key = entry_key(host, base)
+        with self.lock:
+            flight = self.flights.get(key)
+            if flight is not None:
+                return flight, False
+            flight = self.flights[key] = Future()
+            return flight, True
+
+    def finish(self, host, scanner=None, error=None, base=None):
+        """Publish the leader's outcome to every caller waiting on the host"""
+        with self.lock:
+            flight = self.flights.pop(entry_key(host, base), None)
+        if flight is None:
+            return
+        if error is not None:
+            flight.set_exception(error)
+        else:
+            flight.set_result(scanner)
+
+    def run(self, host, fn, base=None):
+        """Call fn() to scan host unless a scan for it is already in flight"""
+        flight, leader = self.join(host, base)
+        if not leader:
+            return flight.result()
+        try:
+            scanner = fn()
+        except BaseException as err:
+            self.finish(host, error=err, base=base)
+            raise
+        self.finish(host, scanner, base=base)
+        return scanner
+
+
+def get_registry():
+    """Return the in-flight registry shared by the CLI, batch runners and GUI"""
+    global _registry
+    if _registry is None:
+        with _lock:
+            if _registry is None:
+                _registry = InFlightRegistry()
+    return _registry
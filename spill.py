@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+
+import os
+import json
+import zlib
+import struct
+import threading
+import config
+
+
+# Each frame is a 4-byte big-endian body length followed by zlib-compressed JSON
+FRAME = struct.Struct('>I')
+
+
+def load_index(path):
+    """Return {host: (offset, length)} from a spill's index; the last entry for a host wins"""
+    index = {}
+    if not os.path.exists(path):
+        return index
+    with open(path, 'r') as handle:
+        for line in handle:
+            fields = line.rstrip('\n').split('\t')
+            # A line cut short by a crash points at a frame that may be incomplete
+            if not line.endswith('\n') or len(fields) != 3:
+                continue
+            index[fields[0]] = (int(fields[1]), int(fields[2]))
+    return index
+
+
+class PayloadSpill:
+    """Append-only file of compressed getScanResults payloads with a host -> (offset, length) index"""
+
+    def __init__(self, path, resume=False, in_memory=True):
+        self.path = os.path.expanduser(path)
+        self.index_path = f'{self.path}.idx'
+        self.lock = threading.Lock()
+        # A write-only spill (a batch run) leaves its index on disk so memory stays flat
+        self.in_memory = in_memory
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self.index = load_index(self.index_path) if resume and in_memory else {}
+        self.open('ab' if resume else 'wb', 'a' if resume else 'w')
+
+    def open(self, mode, index_mode):
+        self.handle = open(self.path, mode)
+        self.handle.seek(0, os.SEEK_END)
+        self.size = self.handle.tell()
+        self.reader = open(self.path, 'rb')
+        self.index_handle = open(self.index_path, index_mode)
+        self.live = sum(FRAME.size + length for _, length in self.index.values())
+
+    def put(self, host, payload):
+        """Append a payload and return its (offset, length)"""
+        body = zlib.compress(json.dumps(payload, separators=(',', ':')).encode(), config.SPILL_COMPRESSION)
+        with self.lock:
+            offset = self.size
+            self.handle.write(FRAME.pack(len(body)))
+            self.handle.write(body)
+            self.handle.flush()
+            self.size += FRAME.size + len(body)
+            # Indexed only once the frame is on disk
+            self.index_handle.write(f'{host}\t{offset}\t{len(body)}\n')
+            self.index_handle.flush()
+            if self.in_memory:
+                self.forget(host)
+                self.index[host] = (offset, len(body))
+                self.live += FRAME.size + len(body)
+        return offset, len(body)
+
+    def forget(self, host):
+        entry = self.index.pop(host, None)
+        if entry is not None:
+            self.live -= FRAME.size + entry[1]
+
+    def discard(self, host):
+        """Drop a host's payload from the index; compact() reclaims the space"""
+        with self.lock:
+            self.forget(host)
+
+    def _read(self, offset, length):
+        self.reader.seek(offset + FRAME.size)
+        return self.reader.read(length)
+
+    def read(self, offset, length):
+        with self.lock:
+            body = self._read(offset, length)
+        return json.loads(zlib.decompress(body))
+
+    def get(self, host):
+        """Return the newest payload spilled for host, or None"""
+        # One lock for the lookup and the read, so compact() cannot move the frame in between
+        with self.lock:
+            entry = self.index.get(host)
+            if entry is None:
+                return None
+            body = self._read(*entry)
+        return json.loads(zlib.decompress(body))
+
+    def needs_compaction(self):
+        return self.in_memory and self.size > config.SPILL_COMPACT_MIN and self.size > config.SPILL_COMPACT_RATIO * self.live
+
+    def compact(self):
+        """Rewrite only the live frames, so a long-running spill stays proportional to its hosts"""
+        with self.lock:
+            temp = f'{self.path}.tmp'
+            index = {}
+            with open(temp, 'wb') as out, open(f'{self.index_path}.tmp', 'w') as index_out:
+                for host, (offset, length) in self.index.items():
+                    self.reader.seek(offset)
+                    frame = self.reader.read(FRAME.size + length)
+                    index[host] = (out.tell(), length)
+                    out.write(frame)
+                    index_out.write(f'{host}\t{index[host][0]}\t{length}\n')
+            self.close_files()
+            os.replace(temp, self.path)
+            os.replace(f'{self.index_path}.tmp', self.index_path)
+            self.index = index
+            self.open('ab', 'a')
+
+    def close_files(self):
+        for handle in (self.handle, self.reader, self.index_handle):
+            handle.close()
+
+    def close(self):
+        with self.lock:
+            self.close_files()
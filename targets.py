@@ -0,0 +1,183 @@
+#!/usr/bin/env python
+
+import os
+import re
+import hashlib
+import threading
+import config
+from shard import shard_of
+
+
+_filter = None
+_lock = threading.Lock()
+
+# Letters, digits and inner hyphens, 1-63 characters per label
+DOMAIN_PATTERN = re.compile(r'^[a-zA-Z0-9]([a-zA-Z0-9\-]{0,61}[a-zA-Z0-9])?(\.[a-zA-Z0-9]([a-zA-Z0-9\-]{0,61}[a-zA-Z0-9])?)*$')
+
+SCHEME = re.compile(r'^[a-zA-Z][a-zA-Z0-9+.\-]*://')
+
+# Trie node keys that cannot collide with a DNS label
+SUBTREE = '$'
+WILDCARD = '*'
+
+
+def is_valid_domain(domain):
+    """Return whether domain is a syntactically valid host name"""
+    return len(domain) <= 253 and DOMAIN_PATTERN.match(domain) is not None
+
+
+def normalize_host(raw):
+    """Lower-case an ASCII host, dropping any scheme, path or trailing dot; None if it cannot be encoded"""
+    host = SCHEME.sub('', raw.strip(), count=1).split('/', 1)[0].lower().rstrip('.')
+    if not host.isascii():
+        try:
+            host = host.encode('idna').decode('ascii')
+        except UnicodeError:
+            return None
+    return host
+
+
+class SuffixTrie:
+    """Domain rules stored label by label from the TLD down, matched in O(labels)"""
+
+    def __init__(self, rules=()):
+        self.root = {}
+        self.size = 0
+        for rule in rules:
+            self.add(rule)
+
+    def add(self, rule):
+        """'example.com' matches the domain and its subdomains, '*.example.com' only subdomains"""
+        rule = rule.strip().lower()
+        wildcard = rule.startswith('*.')
+        host = normalize_host(rule[2:] if wildcard else rule)
+        if not host:
+            raise ValueError(f'Invalid domain rule: {rule}')
+        node = self.root
+        for label in reversed(host.split('.')):
+            node = node.setdefault(label, {})
+        node[WILDCARD if wildcard else SUBTREE] = True
+        self.size += 1
+
+    def match(self, host):
+        """Return whether a normalized host is covered by any rule"""
+        node = self.root
+        labels = host.split('.')
+        for depth in range(len(labels) - 1, -1, -1):
+            node = node.get(labels[depth])
+            if node is None:
+                return False
+            if SUBTREE in node or (depth and WILDCARD in node):
+                return True
+        return False
+
+    def __len__(self):
+        return self.size
+
+
+class TargetFilter:
+    """Allow/block policy from config.ALLOWED_DOMAINS and config.BLOCKED_DOMAINS"""
+
+    def __init__(self, allowed=None, blocked=None):
+        self.allowed = SuffixTrie(config.ALLOWED_DOMAINS if allowed is None else allowed)
+        self.blocked = SuffixTrie(config.BLOCKED_DOMAINS if blocked is None else blocked)
+
+    def check(self, host):
+        """Return why a normalized host may not be scanned, or None"""
+        if self.blocked.match(host):
+            return 'blocked'
+        if len(self.allowed) and not self.allowed.match(host):
+            return 'not allowed'
+        return None
+
+
+class SeenHosts:
+    """Exact duplicate detection that spills fingerprints to SQLite past a memory limit"""
+
+    def __init__(self, limit=None):
+        self.limit = config.TARGETS_DEDUP_MEMORY if limit is None else limit
+        self.memory = set()
+        self.conn = None
+        self.path = None
+
+    def add(self, host):
+        """Record host; return False if it was already seen"""
+        # 64-bit fingerprints: a collision is vanishingly unlikely below billions of hosts
+        key = int.from_bytes(hashlib.blake2b(host.encode(), digest_size=8).digest(), 'big', signed=True)
+        if key in self.memory:
+            return False
+        if self.conn is None:
+            if len(self.memory) < self.limit:
+                self.memory.add(key)
+                return True
+            self.spill()
+        cursor = self.conn.execute('INSERT OR IGNORE INTO seen VALUES (?)', (key,))
+        return cursor.rowcount == 1
+
+    def spill(self):
+        import sqlite3
+        import tempfile
+
+        handle, self.path = tempfile.mkstemp(prefix='observer-targets-', suffix='.sqlite3')
+        os.close(handle)
+        self.conn = sqlite3.connect(self.path, isolation_level=None)
+        self.conn.execute('PRAGMA journal_mode=OFF')
+        self.conn.execute('PRAGMA synchronous=OFF')
+        self.conn.execute('CREATE TABLE seen (key INTEGER PRIMARY KEY) WITHOUT ROWID')
+        self.conn.execute('BEGIN')
+
+    def close(self):
+        self.memory = set()
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+            os.unlink(self.path)
+
+
+class TargetPipeline:
+    """Stream raw target lines into normalized, valid, permitted, unique hosts"""
+
+    def __init__(self, target_filter=None, limit=None, shard=None):
+        self.filter = target_filter or get_target_filter()
+        self.limit = limit
+        # (index, count): keep only the hosts consistent hashing assigns to this shard
+        self.shard = shard
+        self.counts = {'accepted': 0, 'invalid': 0, 'blocked': 0, 'not allowed': 0, 'other shard': 0, 'duplicate': 0}
+
+    def run(self, lines, on_skip=None):
+        """Yield each accepted host; on_skip(raw, reason) hears about the rest"""
+        seen = SeenHosts(self.limit)
+        try:
+            for raw in lines:
+                host = normalize_host(raw)
+                if not host or not is_valid_domain(host):
+                    reason = 'invalid'
+                else:
+                    reason = self.filter.check(host)
+                    if reason is None and self.shard is not None and shard_of(host, self.shard[1]) != self.shard[0]:
+                        reason = 'other shard'
+                    if reason is None and not seen.add(host):
+                        reason = 'duplicate'
+                if reason is not None:
+                    self.counts[reason] += 1
+                    if on_skip is not None:
+                        on_skip(raw, reason)
+                    continue
+                self.counts['accepted'] += 1
+                yield host
+        finally:
+            seen.close()
+
+    def summary(self):
+        skipped = ', '.join(f'{count} {reason}' for reason, count in self.counts.items() if reason != 'accepted' and count)
+        return f"{self.counts['accepted']} targets accepted" + (f' ({skipped} skipped)' if skipped else '')
+
+
+def get_target_filter():
+    """Return the allow/block policy shared by this process"""
+    global _filter
+    if _filter is None:
+        with _lock:
+            if _filter is None:
+                _filter = TargetFilter()
+    return _filter
@@ -0,0 +1,57 @@
+import os
+import sys
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config  # noqa: E402
+import mock_api  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def fresh_process(tmp_path, monkeypatch):
+    """Fast delays, unlimited rate limits, throwaway stores and no process-wide state left from other tests"""
+    import cache
+    import history
+    import archive
+    import ratelimit
+    import retry
+    import session
+    import singleflight
+
+    monkeypatch.setattr(config, 'CACHE_PATH', str(tmp_path / 'results.sqlite3'))
+    monkeypatch.setattr(config, 'HISTORY_PATH', str(tmp_path / 'history.sqlite3'))
+    monkeypatch.setattr(config, 'ARCHIVE_PATH', str(tmp_path / 'archive'))
+    monkeypatch.setattr(config, 'API_RATE_LIMITS', {budget: (1e6, 1e6) for budget in config.API_RATE_LIMITS})
+    monkeypatch.setattr(config, 'API_RETRY_BACKOFF', 0.01)
+    monkeypatch.setattr(config, 'API_BREAKER_RESET', 0.3)
+    monkeypatch.setattr(config, 'SCAN_POLL_INITIAL', 0.02)
+    monkeypatch.setattr(config, 'SCAN_CHECK_INTERVAL', 0.02)
+    monkeypatch.setattr(config, 'SCAN_POLL_MAX', 0.05)
+    monkeypatch.setattr(config, 'SCAN_COOLDOWN_WAIT', 0.2)
+    for module, name in ((cache, '_cache'), (history, '_history'), (archive, '_archive'), (retry, '_breaker'), (singleflight, '_registry')):
+        monkeypatch.setattr(module, name, None)
+    monkeypatch.setattr(ratelimit, '_limiters', {})
+    session.close_session()
+    yield
+    session.close_session()
+
+
+@pytest.fixture
+def mock_api_server():
+    """Start mock_api servers in this process; call with MockObservatory settings, get (api, base URL)"""
+    servers = []
+
+    def start(**settings):
+        api = mock_api.MockObservatory(**{'pending': 0.05, 'running': 0.05, **settings})
+        server = mock_api.make_server(api)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return api, f'http://127.0.0.1:{server.server_address[1]}{mock_api.PREFIX}'
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
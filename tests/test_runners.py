@@ -0,0 +1,149 @@
+import asyncio
+import threading
+
+import pytest
+
+import config
+import retry
+from async_scanner import AsyncBatchRunner
+from batch import BatchRunner
+from journal import Journal, load_journal
+from observer import ScanOptions, scan_many, scan_many_async
+from polling import ScanTimeout
+from singleflight import get_registry
+
+
+HOSTS = [f'host{number}.example.com' for number in range(8)]
+ENGINES = ['threads', 'async']
+
+
+def run_batch(engine, options, hosts, **kwargs):
+    """Collect every (target, scanner, error) a batch runner yields"""
+    if engine == 'threads':
+        return list(BatchRunner(options, hosts, **kwargs).run())
+
+    async def collect():
+        return [result async for result in AsyncBatchRunner(options, hosts, **kwargs).run()]
+
+    return asyncio.run(collect())
+
+
+def options_for(base, timeout=30):
+    return ScanOptions(timeout=timeout, use_cache=False, api_base=base)
+
+
+def assert_all_finished(results, hosts):
+    assert sorted(target for target, _, _ in results) == sorted(hosts)
+    for target, scan, err in results:
+        assert err is None, f'{target}: {err!r}'
+        assert scan.scan_result
+
+
+@pytest.mark.parametrize('engine', ENGINES)
+def test_duplicate_targets_share_one_scan(engine, mock_api_server):
+    api, base = mock_api_server()
+    # Room for every host, so each duplicate is read while its host is still in flight
+    targets = [host for host in HOSTS for _ in range(2)]
+    results = run_batch(engine, options_for(base), targets, concurrency=len(HOSTS))
+    assert_all_finished(results, targets)
+    assert api.calls['POST analyze'] == len(HOSTS)
+    assert not get_registry().flights
+
+
+@pytest.mark.parametrize('engine', ENGINES)
+def test_cooldown_parks_scans_until_they_can_rescan(engine, mock_api_server):
+    api, base = mock_api_server(cooldown_rate=0.5, seed=1)
+    results = run_batch(engine, options_for(base), HOSTS, concurrency=4)
+    assert_all_finished(results, HOSTS)
+    # Every cooldown answer was retried after parking, not reported as a failure
+    assert api.calls['POST analyze'] > len(HOSTS)
+    assert not get_registry().flights
+
+
+@pytest.mark.parametrize('engine', ENGINES)
+def test_resume_polls_the_submitted_scan(engine, mock_api_server):
+    api, base = mock_api_server()
+    resume = {host: api.analyze(host)['scan_id'] for host in HOSTS[:4]}
+    results = run_batch(engine, options_for(base), HOSTS, concurrency=4, resume=resume)
+    assert_all_finished(results, HOSTS)
+    for target, scan, _ in results:
+        if target in resume:
+            assert scan.scan_id == resume[target]
+    # Only the hosts without a resumable scan were submitted again
+    assert api.calls['POST analyze'] == len(HOSTS) - len(resume)
+
+
+@pytest.mark.parametrize('engine', ENGINES)
+def test_journal_records_submissions_for_resume(engine, mock_api_server, tmp_path):
+    api, base = mock_api_server()
+    journal = Journal(str(tmp_path / 'batch.journal'))
+    results = run_batch(engine, options_for(base), HOSTS, concurrency=4, journal=journal)
+    journal.close()
+    _, resume, count = load_journal(journal.path)
+    assert count == 0
+    assert resume == {target: scan.scan_id for target, scan, _ in results}
+
+
+@pytest.mark.parametrize('engine', ENGINES)
+def test_resumed_scans_wait_behind_an_open_circuit(engine, mock_api_server):
+    api, base = mock_api_server()
+    resume = {host: api.analyze(host)['scan_id'] for host in HOSTS[:4]}
+    breaker = retry.get_breaker()
+    for _ in range(breaker.threshold):
+        breaker.record_failure()
+    results = run_batch(engine, options_for(base), HOSTS[:4], concurrency=4, resume=resume)
+    assert_all_finished(results, HOSTS[:4])
+    assert {target: scan.scan_id for target, scan, _ in results} == resume
+    assert api.calls['POST analyze'] == 0
+    assert breaker.state == breaker.CLOSED
+
+
+@pytest.mark.parametrize('engine', ENGINES)
+def test_breaker_opens_on_errors_and_recovers(engine, mock_api_server, monkeypatch):
+    monkeypatch.setattr(config, 'API_BREAKER_THRESHOLD', 1)
+    api, base = mock_api_server(error_rate=1.0)
+    # The API comes back before the breaker's first probe
+    recover = threading.Timer(0.15, setattr, (api, 'error_rate', 0.0))
+    recover.start()
+    try:
+        results = run_batch(engine, options_for(base), HOSTS, concurrency=4)
+    finally:
+        recover.cancel()
+    assert_all_finished(results, HOSTS)
+    assert api.calls['POST analyze'] > len(HOSTS)
+    assert retry.get_breaker().state == retry.CircuitBreaker.CLOSED
+
+
+@pytest.mark.parametrize('engine', ENGINES)
+def test_breaker_that_stays_open_times_scans_out(engine, mock_api_server, monkeypatch):
+    monkeypatch.setattr(config, 'API_BREAKER_THRESHOLD', 1)
+    api, base = mock_api_server(error_rate=1.0)
+    results = run_batch(engine, options_for(base, timeout=0.5), HOSTS[:3], concurrency=3)
+    assert sorted(target for target, _, _ in results) == sorted(HOSTS[:3])
+    for _, _, err in results:
+        assert isinstance(err, ScanTimeout)
+    assert not get_registry().flights
+
+
+def test_scan_many_early_close_releases_flights(mock_api_server):
+    api, base = mock_api_server(pending=1.0)
+    results = scan_many(HOSTS, concurrency=4, use_cache=False, api_base=base)
+    first = next(results)
+    results.close()
+    assert first.host in HOSTS
+    assert not get_registry().flights
+
+
+def test_scan_many_async_early_close_releases_flights(mock_api_server):
+    api, base = mock_api_server(pending=1.0)
+
+    async def first_result():
+        results = scan_many_async(HOSTS, concurrency=4, use_cache=False, api_base=base)
+        try:
+            return await results.__anext__()
+        finally:
+            await results.aclose()
+
+    first = asyncio.run(first_result())
+    assert first.host in HOSTS
+    assert not get_registry().flights
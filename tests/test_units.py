@@ -0,0 +1,217 @@
+import collections
+import csv
+import io
+
+import pytest
+
+import config
+from journal import load_journal
+from mock_api import make_tests
+from shard import StoredScan, host_key, jump_hash, shard_of
+from spill import PayloadSpill
+from targets import SeenHosts, SuffixTrie, TargetFilter
+from writers import CsvWriter
+
+
+def test_suffix_trie_domain_rule_covers_subdomains():
+    trie = SuffixTrie(['example.com'])
+    assert trie.match('example.com')
+    assert trie.match('www.example.com')
+    assert trie.match('a.b.example.com')
+    assert not trie.match('badexample.com')
+    assert not trie.match('example.org')
+    assert not trie.match('com')
+
+
+def test_suffix_trie_wildcard_rule_covers_only_subdomains():
+    trie = SuffixTrie(['*.example.org', 'Other.NET'])
+    assert len(trie) == 2
+    assert trie.match('www.example.org')
+    assert not trie.match('example.org')
+    assert trie.match('other.net')
+
+
+def test_suffix_trie_rejects_invalid_rules():
+    with pytest.raises(ValueError):
+        SuffixTrie(['*.'])
+
+
+def test_target_filter_blocks_before_allowing():
+    target_filter = TargetFilter(allowed=['example.com'], blocked=['internal.example.com'])
+    assert target_filter.check('www.example.com') is None
+    assert target_filter.check('db.internal.example.com') == 'blocked'
+    assert target_filter.check('example.net') == 'not allowed'
+    assert TargetFilter(allowed=[], blocked=[]).check('example.net') is None
+
+
+def test_jump_hash_spreads_keys_evenly():
+    counts = collections.Counter(jump_hash(host_key(f'host{number}.example.com'), 10) for number in range(20000))
+    assert sorted(counts) == list(range(10))
+    assert max(counts.values()) < 1.1 * min(counts.values())
+
+
+def test_jump_hash_growing_moves_keys_only_to_the_new_bucket():
+    hosts = [f'host{number}.example.com' for number in range(20000)]
+    moved = 0
+    for host in hosts:
+        before, after = shard_of(host, 9), shard_of(host, 10)
+        if before != after:
+            assert after == 10
+            moved += 1
+    # About 1/10 of the keys move
+    assert 0.08 < moved / len(hosts) < 0.12
+
+
+def test_shard_of_is_stable():
+    # Shards written by one release or machine must be readable by another
+    assert host_key('example.com') == 1424565772579972710
+    assert shard_of('example.com', 1) == 1
+    assert shard_of('example.com', 16) == 14
+
+
+def test_load_journal_missing_file(tmp_path):
+    finished, resume, count = load_journal(str(tmp_path / 'missing.journal'))
+    assert resume == {} and count == 0
+    assert finished.add('example.com')
+
+
+def test_load_journal_events(tmp_path):
+    path = tmp_path / 'batch.journal'
+    path.write_text(
+        'S\ta.example.com\t1\n'
+        'S\tb.example.com\t2\n'
+        'F\ta.example.com\t1\n'
+        'S\tc.example.com\t3\n'
+        'E\tc.example.com\tHTTP 500\n'
+        'S\td.example.com\t4\n'
+        'F\te.example.com\t5\n'
+        'F\te.example.com\t5\n'
+        'X\tf.example.com\t6\n'
+        'S\tg.example.com\tnot-a-number\n'
+        'S\th.example.com\t8'
+    )
+    finished, resume, count = load_journal(str(path))
+    # b and d were submitted but never finished; h's line was torn by a crash
+    assert resume == {'b.example.com': 2, 'd.example.com': 4}
+    assert count == 2
+    assert not finished.add('a.example.com')
+    assert not finished.add('e.example.com')
+    assert finished.add('b.example.com')
+
+
+def test_seen_hosts_spills_past_its_memory_limit():
+    seen = SeenHosts(limit=2)
+    try:
+        assert [seen.add(host) for host in ['a', 'b', 'c', 'a', 'c', 'd']] == [True, True, True, False, False, True]
+        assert seen.conn is not None
+    finally:
+        seen.close()
+
+
+def test_payload_spill_round_trip(tmp_path):
+    path = str(tmp_path / 'payloads.spill')
+    spill = PayloadSpill(path)
+    spill.put('a.example.com', {'version': 1})
+    spill.put('b.example.com', {'version': 1})
+    spill.put('a.example.com', {'version': 2})
+    assert spill.get('a.example.com') == {'version': 2}
+    assert spill.get('b.example.com') == {'version': 1}
+    assert spill.get('c.example.com') is None
+    spill.discard('b.example.com')
+    assert spill.get('b.example.com') is None
+    spill.close()
+
+
+def test_payload_spill_compact_keeps_only_live_frames(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, 'SPILL_COMPACT_MIN', 0)
+    path = str(tmp_path / 'payloads.spill')
+    spill = PayloadSpill(path)
+    for version in range(20):
+        spill.put('a.example.com', {'version': version})
+    spill.put('b.example.com', {'version': 0})
+    assert spill.needs_compaction()
+    size = spill.size
+    spill.compact()
+    assert spill.size < size
+    assert not spill.needs_compaction()
+    assert spill.get('a.example.com') == {'version': 19}
+    assert spill.get('b.example.com') == {'version': 0}
+    # Still appendable after the files were swapped
+    spill.put('c.example.com', {'version': 0})
+    assert spill.get('c.example.com') == {'version': 0}
+    spill.close()
+
+
+def test_payload_spill_resume_reloads_the_index(tmp_path):
+    path = str(tmp_path / 'payloads.spill')
+    spill = PayloadSpill(path)
+    spill.put('a.example.com', {'version': 1})
+    spill.close()
+    with open(f'{path}.idx', 'a') as index:
+        # A crash between writing a frame and finishing its index line
+        index.write('b.example.com\t999')
+    spill = PayloadSpill(path, resume=True)
+    assert spill.get('a.example.com') == {'version': 1}
+    assert spill.get('b.example.com') is None
+    spill.close()
+
+
+def test_payload_spill_write_only_keeps_no_index_in_memory(tmp_path):
+    path = str(tmp_path / 'payloads.spill')
+    spill = PayloadSpill(path, in_memory=False)
+    offset, length = spill.put('a.example.com', {'version': 1})
+    assert spill.index == {}
+    assert spill.read(offset, length) == {'version': 1}
+    spill.close()
+    spill = PayloadSpill(path, resume=True)
+    assert spill.get('a.example.com') == {'version': 1}
+    spill.close()
+
+
+def stored_scan(host, scan_id):
+    return StoredScan({'scan_id': scan_id, 'tests': make_tests(host, scan_id), 'scanned_at': 1000.0, 'elapsed': 2.5})
+
+
+def test_csv_writer_host_rows():
+    stream = io.StringIO()
+    writer = CsvWriter(stream)
+    writer.write('example.com', stored_scan('example.com', 7))
+    writer.write_error('bad.example.com', ValueError('boom'))
+    rows = list(csv.DictReader(io.StringIO(stream.getvalue())))
+    assert rows[0]['host'] == 'example.com'
+    assert rows[0]['scan_id'] == '7'
+    assert rows[0]['elapsed'] == '2.5'
+    assert int(rows[0]['total']) == len(make_tests('example.com', 7))
+    assert rows[1] == {**{field: '' for field in rows[1]}, 'host': 'bad.example.com', 'error': 'boom'}
+
+
+def test_csv_writer_test_rows():
+    stream = io.StringIO()
+    CsvWriter(stream, records='test').write('example.com', stored_scan('example.com', 7))
+    rows = list(csv.DictReader(io.StringIO(stream.getvalue())))
+    assert len(rows) == len(make_tests('example.com', 7))
+    assert {row['host'] for row in rows} == {'example.com'}
+
+
+def test_csv_writer_header_on_resume(tmp_path):
+    path = tmp_path / 'results.csv'
+    # A resumed run into a new or empty file still needs the header
+    with open(path, 'a', newline='') as stream:
+        CsvWriter(stream, resume=True).write('a.example.com', stored_scan('a.example.com', 1))
+    with open(path, 'a', newline='') as stream:
+        CsvWriter(stream, resume=True).write('b.example.com', stored_scan('b.example.com', 2))
+    with open(path, newline='') as stream:
+        rows = list(csv.reader(stream))
+    assert [row[0] for row in rows] == ['host', 'a.example.com', 'b.example.com']
+
+
+def test_csv_writer_header_without_resume(tmp_path):
+    path = tmp_path / 'results.csv'
+    path.write_text('host\n')
+    with open(path, 'a', newline='') as stream:
+        CsvWriter(stream).write('a.example.com', stored_scan('a.example.com', 1))
+    lines = path.read_text().splitlines()
+    # Without --resume the output is treated as new and gets its own header
+    assert lines[0] == 'host'
+    assert lines[1].startswith('host,scan_id,')
+    assert lines[2].startswith('a.example.com,')
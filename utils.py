@@ -1,84 +1,144 @@
 #!/usr/bin/env python
 
-import re
-import time
 from sys import platform
 from colorama import Fore, Style
-from rich.console import Console
-from rich.table import Table
+from normalize import STATUS_LABELS, normalize_results, summarize
 
 
 class Utils:
-    def __init__(self):
-        self.console = Console()
-
-    def msg(self, text, level):
-        if 'error' in level:
-            print(f'{Fore.RED}[!]{Style.RESET_ALL} {text}')
-        elif 'warn' in level:
-            print(f'{Fore.YELLOW}[!]{Style.RESET_ALL} {text}')
-        elif 'info' in level:
-            print(f'{Fore.BLUE}[*]{Style.RESET_ALL} {text}')
-        elif 'success' in level:
-            print(f'{Fore.GREEN}[$]{Style.RESET_ALL} {text}')
-        elif 'title' in level:
-            print(f'{Fore.CYAN}{text}{Style.RESET_ALL}')
-        else:
-            print(f'{text}')
-
-    def countdown(self, t, cb):
-        for i in range(t, -1, -1):
-            mins, secs = divmod(i, 60)
-            timer = f'{mins:02d}:{secs:02d}'
-            print(f'{Fore.BLUE}{timer}{Style.RESET_ALL}', end="\r")
-            time.sleep(1)
-        print(end='')
-        cb()
+    def __init__(self, out=None):
+        # Messages go to the log pipeline unless they are part of a writer's output stream
+        self.out = out
+        self._console = None
+
+    @property
+    def console(self):
+        # rich is slow to import, so only load it once something is rendered
+        if self._console is None:
+            from rich.console import Console
+            self._console = Console(file=self.out)
+        return self._console
+
+    def msg(self, text, level, **fields):
+        """Log text at a Utils level ('error', 'warn', 'info', ...) with optional host/scan_id/state fields"""
+        # logging is only loaded once there is something to say
+        from log import format_console, log_message, style_of
+
+        style = style_of(level)
+        if self.out is not None:
+            print(format_console(text, style), file=self.out)
+            return
+        log_message(text, style, **fields)
 
     def display_elapsed(self, t):
-        print(f"{Fore.BLUE}{int(t / 3600)}H {int((t / 60) % 60) if t / 3600 > 0 else int(t / 60)}M {int(t % 60)}S{Style.RESET_ALL}")
+        print(f"{Fore.BLUE}{int(t / 3600)}H {int((t / 60) % 60) if t / 3600 > 0 else int(t / 60)}M {int(t % 60)}S{Style.RESET_ALL}", file=self.out)
 
     def print_result(self, data, elapsed):
-        print(f'{Fore.GREEN}Scan completed in: {Style.RESET_ALL}', end='')
+        print(f'{Fore.GREEN}Scan completed in: {Style.RESET_ALL}', end='', file=self.out)
         self.display_elapsed(elapsed)
         self.msg('Results', 'title')
 
+        from rich.table import Table
         table = Table(show_header=True, header_style="bold blue")
         table.add_column("Test", style="cyan")
         table.add_column("Status", style="green")
         table.add_column("Score", style="yellow")
         table.add_column("Description", style="white")
 
-        for key in data.keys():
-            test_data = data[key]
-            status = "✅ PASS" if test_data['pass'] else "❌ FAIL" if test_data['pass'] is False else "⚠️  INFO"
-            score = f"{test_data['score_modifier']:+d}" if test_data['score_modifier'] != 0 else "0"
-            
-            # Clean up HTML tags from description
-            description = test_data['score_description']
-            if description:
-                import re
-                description = re.sub(r'<[^>]+>', '', description)  # Remove HTML tags
-                description = description.replace('\n', ' ').strip()  # Clean up whitespace
-                description = description[:80] + "..." if len(description) > 80 else description
-            
+        records = normalize_results(data)
+        for record in records:
             table.add_row(
-                test_data['name'],
-                status,
-                score,
-                description
+                record.name,
+                record.status,
+                record.score,
+                record.short_description
             )
 
         self.console.print(table)
         
         # Print summary
-        total_tests = len(data)
-        passed_tests = sum(1 for test in data.values() if test['pass'] is True)
-        failed_tests = sum(1 for test in data.values() if test['pass'] is False)
-        info_tests = total_tests - passed_tests - failed_tests
+        total_tests, passed_tests, failed_tests, info_tests = summarize(records)
         
-        print(f"\n{Fore.CYAN}Summary:{Style.RESET_ALL}")
-        print(f"  Total Tests: {total_tests}")
-        print(f"  Passed: {Fore.GREEN}{passed_tests}{Style.RESET_ALL}")
-        print(f"  Failed: {Fore.RED}{failed_tests}{Style.RESET_ALL}")
-        print(f"  Info: {Fore.YELLOW}{info_tests}{Style.RESET_ALL}")
+        print(f"\n{Fore.CYAN}Summary:{Style.RESET_ALL}", file=self.out)
+        print(f"  Total Tests: {total_tests}", file=self.out)
+        print(f"  Passed: {Fore.GREEN}{passed_tests}{Style.RESET_ALL}", file=self.out)
+        print(f"  Failed: {Fore.RED}{failed_tests}{Style.RESET_ALL}", file=self.out)
+        print(f"  Info: {Fore.YELLOW}{info_tests}{Style.RESET_ALL}", file=self.out)
+
+    def print_diff(self, previous, changes):
+        if previous is None:
+            self.msg('No earlier scan recorded; this one is the baseline for the next --diff', 'info')
+            return
+        if not changes:
+            self.msg(f'No changes since scan {previous[0]}', 'success')
+            return
+
+        from rich.table import Table
+        table = Table(show_header=True, header_style="bold blue")
+        table.add_column("Test", style="cyan")
+        table.add_column("Change", style="white")
+        table.add_column("Before", style="yellow")
+        table.add_column("After", style="green")
+
+        def outcome(passed, score):
+            if score is None:
+                return "-"
+            return f"{STATUS_LABELS[passed]} ({score:+d})" if score else STATUS_LABELS[passed]
+
+        for change in changes:
+            table.add_row(
+                change['name'],
+                change['change'],
+                outcome(change['pass_before'], change['score_before']),
+                outcome(change['pass'], change['score_modifier'])
+            )
+
+        self.msg(f'{len(changes)} changes since scan {previous[0]}', 'title')
+        self.console.print(table)
+
+    def print_stats(self, report):
+        """Render an ArchiveStats report as tables"""
+        if not report['rows']:
+            self.msg('The result archive is empty; scan some hosts first', 'warn')
+            return
+
+        from rich.table import Table
+        print(f"{Fore.CYAN}{report['hosts']} hosts, {report['tests']} tests, {report['rows']} archived outcomes{Style.RESET_ALL}", file=self.out)
+
+        rates = Table(title="Failure rate by test (newest scan per host)", show_header=True, header_style="bold blue")
+        rates.add_column("Test", style="cyan")
+        rates.add_column("Failed", style="red", justify="right")
+        rates.add_column("Hosts", style="white", justify="right")
+        rates.add_column("Rate", style="yellow", justify="right")
+        for row in report['failure_rates']:
+            rates.add_row(row['test'], str(row['failed']), str(row['hosts']), f"{row['rate']:.1%}")
+        self.console.print(rates)
+
+        scores = report['scores']
+        percentiles = '  '.join(f"{name} {value:g}" for name, value in scores['percentiles'].items())
+        bands = Table(title=f"Score distribution ({percentiles})", show_header=True, header_style="bold blue")
+        bands.add_column("Score", style="cyan")
+        bands.add_column("Hosts", style="white", justify="right")
+        for low, count in scores['bands']:
+            bands.add_row(f"{low} to {low + 9}", str(count))
+        self.console.print(bands)
+
+        worst = Table(title=f"Lowest-scoring {len(report['worst'])} hosts", show_header=True, header_style="bold blue")
+        worst.add_column("Host", style="cyan")
+        worst.add_column("Score", style="yellow", justify="right")
+        worst.add_column("Failed", style="red", justify="right")
+        for row in report['worst']:
+            worst.add_row(row['host'], str(row['score']), str(row['failed']))
+        self.console.print(worst)
+
+        if report['trend']:
+            from datetime import datetime, timezone
+
+            trend = Table(title="Daily failure rate", show_header=True, header_style="bold blue")
+            trend.add_column("Day (UTC)", style="cyan")
+            trend.add_column("Scans", style="white", justify="right")
+            trend.add_column("Failure rate", style="yellow", justify="right")
+            for row in report['trend']:
+                day = datetime.fromtimestamp(row['day'], timezone.utc).strftime('%Y-%m-%d')
+                trend.add_row(day, str(row['scans']), f"{row['failure_rate']:.1%}")
+            self.console.print(trend)
@@ -0,0 +1,201 @@
+#!/usr/bin/env python
+
+import csv
+import json
+from normalize import normalize_results, summarize
+
+
+FORMATS = ['table', 'json', 'ndjson', 'csv']
+RECORDS = ['host', 'test']
+
+TEST_FIELDS = ['host', 'test', 'name', 'pass', 'score_modifier', 'score_description', 'error']
+HOST_FIELDS = ['host', 'scan_id', 'elapsed', 'cached', 'total', 'passed', 'failed', 'info', 'error']
+DIFF_FIELDS = ['host', 'scan_id', 'previous_scan_id', 'test', 'name', 'change', 'pass_before', 'pass', 'score_before', 'score_modifier', 'error']
+
+
+def host_record(target, scan):
+    return {
+        'host': target,
+        'scan_id': scan.scan_id,
+        'elapsed': round(scan.end - scan.start, 3),
+        'cached': scan.cached_at is not None,
+        'scanned_at': round(scan.cached_at or scan.end, 3),
+        'tests': scan.scan_result,
+    }
+
+
+def test_records(target, scan):
+    for record in normalize_results(scan.scan_result):
+        yield {
+            'host': target,
+            'test': record.key,
+            'name': record.name,
+            'pass': record.passed,
+            'score_modifier': record.score_modifier,
+            'score_description': record.description,
+        }
+
+
+def diff_record(target, scan, previous, changes):
+    return {
+        'host': target,
+        'scan_id': scan.scan_id,
+        'previous_scan_id': previous[0] if previous else None,
+        'cached': scan.cached_at is not None,
+        'changes': changes,
+    }
+
+
+def change_records(target, scan, previous, changes):
+    for change in changes:
+        yield {'host': target, 'scan_id': scan.scan_id, 'previous_scan_id': previous[0] if previous else None, **change}
+
+
+def summary_record(target, scan):
+    record = host_record(target, scan)
+    del record['tests']
+    record['total'], record['passed'], record['failed'], record['info'] = summarize(normalize_results(scan.scan_result))
+    return record
+
+
+def spilled_record(target, scan, spill):
+    """A summary record pointing at the raw payload appended to a PayloadSpill"""
+    record = summary_record(target, scan)
+    record['spill'] = list(spill.put(target, scan.scan_result))
+    return record
+
+
+class TableWriter:
+    """Human readable rich tables, one per host"""
+
+    def __init__(self, stream, records='host', titles=False, diff=False, spill=None, resume=False):
+        from utils import Utils
+
+        self.utils = Utils(stream)
+        self.titles = titles
+
+    def write(self, target, scan):
+        if self.titles:
+            self.utils.msg(f'Results for {target}', 'title')
+        self.utils.print_result(scan.scan_result, scan.end - scan.start)
+
+    def write_diff(self, target, scan, previous, changes):
+        if self.titles:
+            self.utils.msg(f'Changes for {target}', 'title')
+        self.utils.print_diff(previous, changes)
+
+    def write_error(self, target, err):
+        self.utils.msg(f'{target}: {err}', 'error')
+
+    def write_meta(self, meta):
+        pass
+
+    def close(self):
+        pass
+
+
+class NdjsonWriter:
+    """One JSON object per line, flushed as each host completes"""
+
+    def __init__(self, stream, records='host', titles=False, diff=False, spill=None, resume=False):
+        self.stream = stream
+        self.records = records
+        self.spill = spill
+
+    def emit(self, record):
+        self.stream.write(json.dumps(record, separators=(',', ':')))
+        self.stream.write('\n')
+
+    def write(self, target, scan):
+        if self.records == 'test':
+            for record in test_records(target, scan):
+                self.emit(record)
+        elif self.spill is not None:
+            self.emit(spilled_record(target, scan, self.spill))
+        else:
+            self.emit(host_record(target, scan))
+        self.stream.flush()
+
+    def write_diff(self, target, scan, previous, changes):
+        if self.records == 'test':
+            for record in change_records(target, scan, previous, changes):
+                self.emit(record)
+        else:
+            self.emit(diff_record(target, scan, previous, changes))
+        self.stream.flush()
+
+    def write_error(self, target, err):
+        self.emit({'host': target, 'error': str(err)})
+        self.stream.flush()
+
+    def write_meta(self, meta):
+        """A record describing the run, so a --shard partial result set stands on its own"""
+        self.emit({'shard': meta})
+        self.stream.flush()
+
+    def close(self):
+        self.stream.flush()
+
+
+class JsonWriter(NdjsonWriter):
+    """A single JSON array written element by element"""
+
+    def __init__(self, stream, records='host', titles=False, diff=False, spill=None, resume=False):
+        super().__init__(stream, records, spill=spill)
+        self.first = True
+
+    def emit(self, record):
+        self.stream.write('[\n' if self.first else ',\n')
+        self.first = False
+        self.stream.write(json.dumps(record))
+
+    def close(self):
+        self.stream.write('[]\n' if self.first else '\n]\n')
+        self.stream.flush()
+
+
+class CsvWriter:
+    """Flat CSV rows, either one per test or one summary per host; diffs are one row per change"""
+
+    def __init__(self, stream, records='host', titles=False, diff=False, spill=None, resume=False):
+        self.stream = stream
+        self.records = records
+        fields = DIFF_FIELDS if diff else TEST_FIELDS if records == 'test' else HOST_FIELDS
+        self.writer = csv.DictWriter(stream, fieldnames=fields, extrasaction='ignore')
+        # A resumed run appends to a file that already has its header
+        if not (resume and stream.seekable() and stream.tell() > 0):
+            self.writer.writeheader()
+
+    def write(self, target, scan):
+        if self.records == 'test':
+            self.writer.writerows(test_records(target, scan))
+        else:
+            self.writer.writerow(summary_record(target, scan))
+        self.stream.flush()
+
+    def write_diff(self, target, scan, previous, changes):
+        self.writer.writerows(change_records(target, scan, previous, changes))
+        self.stream.flush()
+
+    def write_error(self, target, err):
+        self.writer.writerow({'host': target, 'error': str(err)})
+        self.stream.flush()
+
+    def write_meta(self, meta):
+        pass
+
+    def close(self):
+        self.stream.flush()
+
+
+WRITERS = {
+    'table': TableWriter,
+    'json': JsonWriter,
+    'ndjson': NdjsonWriter,
+    'csv': CsvWriter,
+}
+
+
+def make_writer(fmt, stream, records='host', titles=False, diff=False, spill=None, resume=False):
+    """Create the writer for an output format"""
+    return WRITERS[fmt](stream, records, titles, diff, spill, resume)